@@ -0,0 +1,220 @@
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Set, Union
+
+from app.conf import settings
+
+
+class TTLCache:
+    """Bounded in-process LRU cache whose entries expire after `ttl` seconds"""
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        item = self._data.get(key)
+        if item is None:
+            self.misses += 1
+            return None
+        expires_at, value = item
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        self._data[key] = (expires_at, value)
+        self._data.move_to_end(key)
+        # Evict least recently used entries once full
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def invalidate(self, key: Hashable) -> None:
+        self._data.pop(key, None)
+
+    def __contains__(self, key: Hashable) -> bool:
+        # Membership check that doesn't count as a hit or miss
+        return key in self._data
+
+    def clear(self) -> None:
+        self._data.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+class MemoryResponseCache:
+    """
+    In-process response cache with tag based invalidation. Every invalidation
+    bumps a generation counter and records it as the tag's version, so a fill
+    built from data read before the invalidation can be told apart and skipped.
+    """
+
+    # Each worker has its own, so only the worker serving a write can invalidate it
+    shared = False
+
+    def __init__(self, maxsize: int, ttl: float) -> None:
+        self.entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._tags: Dict[str, Set[str]] = {}
+        self._generation = 0
+        self._versions: OrderedDict[str, int] = OrderedDict()
+        # Versions up to this generation were pruned and are no longer known
+        self._versions_floor = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return self.entries.get(key)
+
+    async def generation(self) -> int:
+        return self._generation
+
+    async def set(
+        self,
+        key: str,
+        value: bytes,
+        tags: Iterable[str] = (),
+        ttl: Optional[float] = None,
+        generation: Optional[int] = None,
+    ) -> bool:
+        # With a generation from before the value was built, the value is only
+        # stored if none of its tags were invalidated since
+        tags = list(tags)
+        if generation is not None and (
+            generation < self._versions_floor
+            or any(self._versions.get(tag, 0) > generation for tag in tags)
+        ):
+            return False
+        self.entries.set(key, value, ttl)
+        for tag in tags:
+            self._tags.setdefault(tag, set()).add(key)
+        # Drop index entries of keys the LRU has already evicted
+        if len(self._tags) > self.entries.maxsize * 4:
+            self._tags = {
+                tag: live_keys
+                for tag, keys in self._tags.items()
+                if (live_keys := {key for key in keys if key in self.entries})
+            }
+        return True
+
+    async def invalidate_tag(self, tag: str) -> None:
+        self._generation += 1
+        self._versions.pop(tag, None)
+        self._versions[tag] = self._generation
+        while len(self._versions) > self.entries.maxsize * 4:
+            _, version = self._versions.popitem(last=False)
+            self._versions_floor = version
+        for key in self._tags.pop(tag, ()):
+            self.entries.invalidate(key)
+
+    async def clear(self) -> None:
+        self.entries.clear()
+        self._tags.clear()
+
+    def stats(self) -> dict:
+        return self.entries.stats()
+
+
+class RedisResponseCache:
+    """
+    Response cache shared by all workers, backed by any client exposing the
+    redis.asyncio API (get, set, incr, smembers, delete, scan_iter and
+    register_script)
+    """
+
+    shared = True
+
+    # KEYS: the response, then its n tag sets, then the n tag versions.
+    # ARGV: value, ttl, tag set ttl, generation (empty to store unconditionally)
+    SET_SCRIPT = """
+        local n = (#KEYS - 1) / 2
+        if ARGV[4] ~= '' then
+            local generation = tonumber(ARGV[4])
+            for i = 1, n do
+                if tonumber(redis.call('GET', KEYS[1 + n + i]) or 0) > generation then
+                    return 0
+                end
+            end
+        end
+        redis.call('SET', KEYS[1], ARGV[1], 'EX', ARGV[2])
+        for i = 1, n do
+            redis.call('SADD', KEYS[1 + i], KEYS[1])
+            redis.call('EXPIRE', KEYS[1 + i], ARGV[3])
+        end
+        return 1
+    """
+
+    def __init__(self, client: Any, ttl: int, prefix: str = "norebase:") -> None:
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.set_script = client.register_script(self.SET_SCRIPT)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(f"{self.prefix}response:{key}")
+
+    async def generation(self) -> int:
+        return int(await self.client.get(f"{self.prefix}generation") or 0)
+
+    async def set(
+        self,
+        key: str,
+        value: bytes,
+        tags: Iterable[str] = (),
+        ttl: Optional[float] = None,
+        generation: Optional[int] = None,
+    ) -> bool:
+        # See MemoryResponseCache.set. The version check and the write happen
+        # atomically in the script
+        tags = list(tags)
+        keys = [
+            f"{self.prefix}response:{key}",
+            *[f"{self.prefix}tag:{tag}" for tag in tags],
+            *[f"{self.prefix}version:{tag}" for tag in tags],
+        ]
+        ex = self.ttl if ttl is None else max(1, math.ceil(ttl))
+        args = [value, ex, self.ttl, "" if generation is None else generation]
+        return bool(await self.set_script(keys=keys, args=args))
+
+    async def invalidate_tag(self, tag: str) -> None:
+        # The version is bumped before the keys are deleted, so a concurrent fill
+        # either sees it and skips, or is stored in time to be deleted
+        generation = await self.client.incr(f"{self.prefix}generation")
+        await self.client.set(f"{self.prefix}version:{tag}", generation, ex=self.ttl)
+        tag_key = f"{self.prefix}tag:{tag}"
+        keys = await self.client.smembers(tag_key)
+        await self.client.delete(tag_key, *keys)
+
+    async def clear(self) -> None:
+        keys = [key async for key in self.client.scan_iter(match=f"{self.prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+def create_response_cache() -> Union[MemoryResponseCache, RedisResponseCache]:
+    if settings.RESPONSE_CACHE_BACKEND == "redis":
+        # Optional dependency, only needed when the redis backend is selected
+        import redis.asyncio as redis
+
+        return RedisResponseCache(
+            redis.from_url(settings.RESPONSE_CACHE_REDIS_URL),
+            ttl=settings.RESPONSE_CACHE_TTL,
+        )
+    return MemoryResponseCache(
+        maxsize=settings.RESPONSE_CACHE_MAX_SIZE, ttl=settings.RESPONSE_CACHE_TTL
+    )
+
+
+response_cache = create_response_cache()
@@ -0,0 +1,104 @@
+import argparse
+import asyncio
+import logging
+import uuid
+
+from sqlalchemy import func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.database import SessionLocal, engine
+from app.initial_data import create_initial_data
+from app.models import Article, Like
+from app.seeding import seed_database
+from app.revocation import revoke
+from app.trending import refresh_trending
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+async def reconcile_likes_count(db: AsyncSession) -> int:
+    # Repair articles whose denormalized likes_count drifted from the likes table
+    actual_count = (
+        select(func.count(Like.id))
+        .where(Like.article_id == Article.id)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        update(Article)
+        .where(Article.likes_count != actual_count)
+        .values(likes_count=actual_count, updated_at=Article.updated_at)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def run_command(args: argparse.Namespace) -> None:
+    if args.command == "seed":
+        logger.info(
+            f"Seeding {args.users} users, {args.articles} articles and "
+            f"{args.likes} likes with seed {args.seed}"
+        )
+        await seed_database(
+            engine,
+            users=args.users,
+            articles=args.articles,
+            likes=args.likes,
+            seed=args.seed,
+            batch_size=args.batch_size,
+        )
+        logger.info("Seeding complete")
+        return
+
+    async with SessionLocal() as db:
+        if args.command == "reconcile_likes":
+            logger.info("Reconciling article likes count")
+            repaired = await reconcile_likes_count(db)
+            logger.info(f"Repaired likes count for {repaired} article(s)")
+        elif args.command == "initial_data":
+            await create_initial_data(db)
+        elif args.command == "refresh_trending":
+            logger.info(f"Recomputing like buckets of the last {args.hours} hours")
+            if not await refresh_trending(db, args.hours):
+                logger.info("Another process is refreshing the buckets, skipped")
+        elif args.command == "revoke_tokens":
+            await revoke(db, jti=args.jti, user_id=args.user_id)
+            logger.info("Token(s) revoked")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(description="Norebase challenge commands")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser(
+        "reconcile_likes", help="Recompute articles.likes_count from the likes table"
+    )
+    subparsers.add_parser(
+        "initial_data", help="Create the demo users and articles if none exist"
+    )
+    trending_parser = subparsers.add_parser(
+        "refresh_trending",
+        help="Recompute the hourly like buckets behind the trending endpoint",
+    )
+    # Enough to backfill the 7 day window
+    trending_parser.add_argument("--hours", type=int, default=7 * 24)
+    revoke_parser = subparsers.add_parser(
+        "revoke_tokens", help="Revoke one auth token or every token of a user"
+    )
+    revoke_target = revoke_parser.add_mutually_exclusive_group(required=True)
+    revoke_target.add_argument("--jti", help="id of the token to revoke")
+    revoke_target.add_argument("--user-id", type=uuid.UUID)
+    seed_parser = subparsers.add_parser(
+        "seed",
+        help="Bulk load synthetic data with COPY, resuming interrupted runs",
+    )
+    seed_parser.add_argument("--users", type=int, default=1000)
+    seed_parser.add_argument("--articles", type=int, default=10000)
+    seed_parser.add_argument("--likes", type=int, default=100000)
+    seed_parser.add_argument("--seed", type=int, default=42)
+    seed_parser.add_argument("--batch-size", type=int, default=10000)
+    asyncio.run(run_command(parser.parse_args(argv)))
+
+
+if __name__ == "__main__":
+    main()
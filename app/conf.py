@@ -1,7 +1,8 @@
+import os
 from pathlib import Path
-from typing import Dict, List, Optional, Union
+from typing import Dict, List, Literal, Optional, Tuple, Union
 
-from pydantic import AnyUrl, field_validator
+from pydantic import AnyUrl, field_validator, model_validator
 from pydantic_settings import BaseSettings
 
 PROJECT_DIR = Path(__file__).parent.parent.parent
@@ -14,9 +15,93 @@ class Settings(BaseSettings):
     # SECURITY
     SECRET_KEY: str
 
+    # PASSWORD HASHING
+    PASSWORD_HASHING_WORKERS: int = 2
+    # Hashing jobs allowed to wait for a worker before logins are rejected with 503
+    PASSWORD_HASHING_QUEUE_SIZE: int = 32
+
+    # RATE LIMITING
+    # Token bucket per client (user id, or IP when anonymous) and route, keyed by
+    # "METHOD route template": [tokens added per second, bucket size]. "memory"
+    # limits each worker separately; "redis" shares the buckets between workers
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_BACKEND: Literal["memory", "redis"] = "memory"
+    RATE_LIMIT_REDIS_URL: Optional[str] = None
+    RATE_LIMIT_MAX_KEYS: int = 100000  # buckets kept by the memory backend
+    RATE_LIMITS: Dict[str, Tuple[float, int]] = {
+        "POST /api/v1/auth/login": (0.2, 10),
+        "GET /api/v1/articles/{slug:str}/like": (2, 30),
+        "POST /api/v1/likes/batch": (0.5, 10),
+    }
+
+    # LOAD SHEDDING
+    # Requests to rate limited routes get 503 while this worker is handling this
+    # many of them, or while connection pool checkouts wait longer than this
+    ADMISSION_MAX_IN_FLIGHT: int = 64
+    ADMISSION_MAX_POOL_WAIT: float = 0.5  # seconds, recent average
+
+    # SERIALIZATION
+    # Encode article payloads with orjson instead of validating them through pydantic
+    FAST_JSON: bool = False
+
+    # STATELESS AUTH
+    # Trust the name and email claims of valid, unrevoked tokens instead of
+    # loading the user
+    AUTH_STATELESS: bool = False
+    # Revocations reach every worker within this many seconds, in either mode
+    AUTH_REVOCATION_REFRESH_INTERVAL: float = 30
+
+    # AUTH CACHE
+    AUTH_CACHE_TTL: int = 60  # seconds
+    AUTH_CACHE_MAX_SIZE: int = 10000
+
+    # METRICS
+    # Request and database metrics served at /metrics
+    METRICS_ENABLED: bool = True
+
+    # SQL PROFILING
+    # Profiling runs on every request in DEBUG, otherwise only for requests that
+    # send this value in the X-Profile-SQL header
+    SQL_PROFILE_TOKEN: Optional[str] = None
+    SQL_REPEATED_QUERY_THRESHOLD: int = 5  # identical statements per request
+    SQL_ROW_COUNT_THRESHOLD: int = 1000  # rows returned by one statement
+
+    # LIKE WRITE-BEHIND
+    # Buffer like toggles in memory and write them in batches. Buffered toggles
+    # are lost if the process dies before a flush, see README
+    LIKE_WRITE_BEHIND: bool = False
+    LIKE_FLUSH_INTERVAL: float = 1  # seconds between flushes
+    LIKE_FLUSH_MAX_BATCH: int = 500  # buffered toggles that trigger an early flush
+
+    # BACKGROUND TASKS
+    # "memory" runs tasks in the worker that queued them and loses them if it dies.
+    # "postgres" stores them in the background_tasks table for any worker to run
+    TASK_QUEUE_BACKEND: Literal["memory", "postgres"] = "memory"
+    TASK_CONCURRENCY: int = 4  # tasks run at once per worker
+    TASK_MAX_ATTEMPTS: int = 5
+    TASK_RETRY_BACKOFF: float = 1  # seconds before the first retry, doubled after each
+    TASK_POLL_INTERVAL: float = 1  # seconds between polls of the postgres queue
+    TASK_LEASE_TIMEOUT: float = 300  # seconds before an unfinished claimed task reruns
+    TASK_DRAIN_TIMEOUT: float = 10  # seconds shutdown waits for queued tasks
+
+    # LIVE LIKES
+    # Each worker holds one extra connection, outside its pool, that LISTENs for
+    # like count changes. DB_MAX_CONNECTIONS accounts for it when it goes to the
+    # primary. LISTEN needs a session, so point this past PgBouncer's transaction pooling
+    LIVE_LIKES_DATABASE_URL: Optional[str] = None  # defaults to SQLALCHEMY_DATABASE_URL
+    LIVE_LIKES_INTERVAL: float = 1  # minimum seconds between events to a stream
+    LIVE_LIKES_KEEPALIVE: float = 15  # seconds of silence before a keepalive comment
+
+    # TRENDING
+    TRENDING_REFRESH_INTERVAL: float = 60  # seconds between bucket refreshes
+    # Hours of buckets recomputed by each refresh; older buckets are left as they are
+    TRENDING_REFRESH_HOURS: int = 2
+
     # PROJECT DETAILS
     PROJECT_NAME: str
     CORS_ALLOWED_ORIGINS: Union[List, str]
+    # Create the demo users and articles on startup
+    SEED_INITIAL_DATA: bool = False
 
     # POSTGRESQL
     POSTGRES_USER: str
@@ -26,6 +111,52 @@ class Settings(BaseSettings):
     POSTGRES_DB: str
     SQLALCHEMY_DATABASE_URL: Optional[str] = None
 
+    # READ REPLICA
+    # The replica's role needs pg_read_all_stats to see its WAL receiver
+    SQLALCHEMY_REPLICA_DATABASE_URL: Optional[str] = None
+    REPLICA_MAX_LAG: float = 5  # seconds behind the primary before reads fall back
+    REPLICA_LAG_CHECK_INTERVAL: float = 5  # seconds between lag checks
+    READ_YOUR_WRITES_WINDOW: float = 10  # seconds a writer's reads stay on the primary
+
+    # RESPONSE CACHE
+    # "memory" is per worker; use "redis" to share the cache and its invalidation
+    RESPONSE_CACHE_BACKEND: Literal["memory", "redis"] = "memory"
+    RESPONSE_CACHE_REDIS_URL: Optional[str] = None
+    RESPONSE_CACHE_TTL: int = 60  # seconds
+    RESPONSE_CACHE_MAX_SIZE: int = 1000
+    # With several workers, "memory" serves bodies up to RESPONSE_CACHE_TTL stale
+    # from the workers that didn't serve the write, so it must be allowed explicitly
+    RESPONSE_CACHE_ALLOW_PER_WORKER: bool = False
+
+    # SERVER
+    HOST: str = "0.0.0.0"
+    PORT: int = 8000
+    WEB_CONCURRENCY: Optional[int] = None  # uvicorn workers, defaults to the CPU count
+    GRACEFUL_SHUTDOWN_TIMEOUT: int = 30  # seconds a stopping worker may spend draining
+    # Comma separated addresses or CIDR ranges of the proxies whose X-Forwarded-For
+    # is trusted for the client address, e.g. the platform load balancer's range.
+    # Never "*": clients could then pick their own address and dodge rate limits
+    FORWARDED_ALLOW_IPS: str = "127.0.0.1"
+
+    # DATABASE POOL
+    # Connections all workers of a machine may open to each database. When set,
+    # every worker's pool is sized to its share instead of DB_POOL_SIZE/DB_MAX_OVERFLOW,
+    # less the live likes LISTEN connection when it goes to the same database
+    DB_MAX_CONNECTIONS: Optional[int] = None
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds before a connection is replaced
+    DB_POOL_PRE_PING: bool = True
+    # Open the pool's connections in the background as a worker starts
+    DB_POOL_WARM_UP: bool = True
+    DB_STATEMENT_TIMEOUT: int = 0  # milliseconds, 0 disables it
+    DB_PREPARE_THRESHOLD: Optional[int] = (
+        5  # psycopg server-side prepare, None disables
+    )
+    # Safe settings for PgBouncer transaction pooling: no prepared statements or startup options
+    DB_PGBOUNCER_MODE: bool = False
+
     @field_validator("SQLALCHEMY_DATABASE_URL", mode="before")
     def assemble_postgres_connection(
         cls, v: Optional[str], info: Dict[str, str]
@@ -55,9 +186,41 @@ class Settings(BaseSettings):
     def assemble_cors_origins(cls, v):
         return v.split()
 
+    @model_validator(mode="after")
+    def check_task_queue_backend(self):
+        # Postgres queued tasks run on any worker, where a per-worker response
+        # cache isn't the one that needs invalidating
+        if (
+            self.TASK_QUEUE_BACKEND == "postgres"
+            and self.RESPONSE_CACHE_BACKEND == "memory"
+        ):
+            raise ValueError(
+                'TASK_QUEUE_BACKEND="postgres" requires RESPONSE_CACHE_BACKEND="redis"'
+            )
+        return self
+
+    @model_validator(mode="after")
+    def check_response_cache_backend(self):
+        # A memory cache is only invalidated in the worker that served the write.
+        # WEB_CONCURRENCY is set for the workers of app.server and read by uvicorn
+        if (
+            self.RESPONSE_CACHE_BACKEND == "memory"
+            and (self.WEB_CONCURRENCY or 1) > 1
+            and not self.RESPONSE_CACHE_ALLOW_PER_WORKER
+        ):
+            raise ValueError(
+                'RESPONSE_CACHE_BACKEND="memory" with several workers requires '
+                "RESPONSE_CACHE_ALLOW_PER_WORKER=true"
+            )
+        return self
+
     class Config:
         env_file = f"{PROJECT_DIR}/.env"
         case_sensitive = True
 
 
 settings: Settings = Settings()
+
+
+def worker_count() -> int:
+    return settings.WEB_CONCURRENCY or os.cpu_count() or 1
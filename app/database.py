@@ -1,14 +1,255 @@
+import asyncio
+import logging
+import time
+from contextvars import ContextVar
+from typing import Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
-from .conf import settings
+from .conf import settings, worker_count
 
 Base = declarative_base()
 
-engine = create_async_engine(settings.SQLALCHEMY_DATABASE_URL)
+logger = logging.getLogger(__name__)
+
+
+# Seconds the current checkout spent opening a new connection
+connect_time: ContextVar[float] = ContextVar("connect_time", default=0.0)
+
+
+class MeasuredQueuePool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long checkouts wait for a connection. Opening a
+    new connection isn't counted as waiting, so the wait times only reflect
+    contention for the pool, not how slow the database is to connect.
+    """
+
+    # Weight of the latest checkout in the recent wait time average
+    RECENT_WAIT_WEIGHT = 0.2
+    # Seconds without checkouts after which the average no longer counts
+    RECENT_WAIT_WINDOW = 5
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.wait_count = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+        self.wait_time_recent = 0.0
+        self.last_checkout = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        token = connect_time.set(0.0)
+        try:
+            return super()._do_get()
+        finally:
+            waited = time.perf_counter() - start - connect_time.get()
+            connect_time.reset(token)
+            self.wait_count += 1
+            self.wait_time_total += waited
+            self.wait_time_max = max(self.wait_time_max, waited)
+            self.wait_time_recent += self.RECENT_WAIT_WEIGHT * (
+                waited - self.wait_time_recent
+            )
+            self.last_checkout = time.monotonic()
+
+    def _create_connection(self):
+        start = time.perf_counter()
+        try:
+            return super()._create_connection()
+        finally:
+            connect_time.set(connect_time.get() + time.perf_counter() - start)
+
+    def recent_wait_time(self) -> float:
+        # Moving average of recent checkout waits, used for load shedding
+        if time.monotonic() - self.last_checkout > self.RECENT_WAIT_WINDOW:
+            return 0.0
+        return self.wait_time_recent
+
+    def recreate(self):
+        # Keep counters across engine.dispose()
+        pool = super().recreate()
+        pool.wait_count = self.wait_count
+        pool.wait_time_total = self.wait_time_total
+        pool.wait_time_max = self.wait_time_max
+        pool.wait_time_recent = self.wait_time_recent
+        pool.last_checkout = self.last_checkout
+        return pool
+
+
+def pool_limits(workers: int, reserved: int = 0) -> Tuple[int, int]:
+    # (pool_size, max_overflow) for one worker, keeping the sum over all workers
+    # within DB_MAX_CONNECTIONS. `reserved` connections per worker are opened
+    # outside the pool and taken from the worker's share first
+    if not settings.DB_MAX_CONNECTIONS:
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    share = max(1, settings.DB_MAX_CONNECTIONS // workers - reserved)
+    pool_size = min(settings.DB_POOL_SIZE, share)
+    return pool_size, share - pool_size
+
+
+def unpooled_connections(url: str) -> int:
+    # Connections each worker opens to this database besides its pool: the
+    # live likes LISTEN connection, which defaults to the primary database
+    def database(url):
+        url = make_url(url)
+        return url.host, url.port or 5432, url.database
+
+    listen_url = settings.LIVE_LIKES_DATABASE_URL or settings.SQLALCHEMY_DATABASE_URL
+    same_database = database(listen_url) == database(url)
+    return 1 if same_database else 0
+
+
+def build_engine(url: str) -> AsyncEngine:
+    connect_args = {}
+    if settings.DB_PGBOUNCER_MODE:
+        # Transaction pooling may run each transaction on a different server
+        # connection, so server-side prepared statements must be disabled and
+        # the statement timeout belongs on the role (ALTER ROLE ... SET)
+        connect_args["prepare_threshold"] = None
+    else:
+        connect_args["prepare_threshold"] = settings.DB_PREPARE_THRESHOLD
+        if settings.DB_STATEMENT_TIMEOUT:
+            connect_args["options"] = (
+                f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT}"
+            )
+
+    pool_size, max_overflow = pool_limits(worker_count(), unpooled_connections(url))
+    return create_async_engine(
+        url,
+        poolclass=MeasuredQueuePool,
+        pool_size=pool_size,
+        max_overflow=max_overflow,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        pool_pre_ping=settings.DB_POOL_PRE_PING,
+        connect_args=connect_args,
+    )
+
+
+async def warm_up_pool(engine: AsyncEngine, connections: int) -> None:
+    # Opens the pool's connections concurrently so the first requests don't pay
+    # for connection setup one after another. Failures are left to requests
+    try:
+        warm = await asyncio.gather(*[engine.connect() for _ in range(connections)])
+        for conn in warm:
+            await conn.close()
+    except Exception as exc:
+        logger.warning(f"Connection pool warm-up failed: {exc}")
+
+
+def pool_stats(engine: AsyncEngine) -> dict:
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        "wait_count": pool.wait_count,
+        "wait_time_total": round(pool.wait_time_total, 6),
+        "wait_time_max": round(pool.wait_time_max, 6),
+    }
+
+
+class ReplicaLagMonitor:
+    """
+    Periodically measures replication lag to decide if the replica can serve reads.
+
+    A replica whose WAL receiver isn't streaming, or hasn't heard from the
+    primary for max_lag seconds, is lagging: having replayed everything it
+    received says nothing once it stops receiving. Otherwise it is caught up
+    when it has replayed up to the primary's current WAL position, and lagging
+    by the age of its last replayed transaction when it hasn't. Reading
+    pg_stat_wal_receiver takes a role with pg_read_all_stats; without it the
+    replica always reads as lagging. The primary sends keepalives every
+    wal_sender_timeout / 2, which must be shorter than max_lag.
+    """
+
+    REPLICA_QUERY = text(
+        "SELECT pg_is_in_recovery(), pg_last_wal_replay_lsn()::text, "
+        "(SELECT EXTRACT(EPOCH FROM now() - last_msg_receipt_time) "
+        "FROM pg_stat_wal_receiver WHERE status = 'streaming'), "
+        "EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp())"
+    )
+    # Bytes of WAL the primary has written past the replica's replay position
+    PRIMARY_QUERY = text(
+        "SELECT pg_wal_lsn_diff(pg_current_wal_lsn(), CAST(:replay_lsn AS pg_lsn))"
+    )
+
+    def __init__(
+        self,
+        engine: AsyncEngine,
+        primary_engine: AsyncEngine,
+        max_lag: float,
+        check_interval: float,
+    ) -> None:
+        self.engine = engine
+        self.primary_engine = primary_engine
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.lag: Optional[float] = None
+        self.checked_at = float("-inf")
+
+    async def measure(self) -> float:
+        async with self.engine.connect() as conn:
+            row = (await conn.execute(self.REPLICA_QUERY)).one()
+        in_recovery, replay_lsn, receipt_age, replay_age = row
+        if not in_recovery:
+            return 0.0
+        if receipt_age is None or receipt_age > self.max_lag:
+            return float("inf")
+        # Read after the replica, so a write in between counts as lag
+        async with self.primary_engine.connect() as conn:
+            behind = (
+                await conn.execute(self.PRIMARY_QUERY, {"replay_lsn": replay_lsn})
+            ).scalar()
+        if behind <= 0:
+            return 0.0
+        return float("inf") if replay_age is None else float(replay_age)
+
+    async def is_usable(self) -> bool:
+        now = time.monotonic()
+        if now - self.checked_at >= self.check_interval:
+            # Set before awaiting so concurrent requests don't all run the check
+            self.checked_at = now
+            try:
+                self.lag = await self.measure()
+            except Exception:
+                # An unreachable replica is treated as unusable until the next check
+                self.lag = None
+        return self.lag is not None and self.lag <= self.max_lag
+
+
+engine = build_engine(settings.SQLALCHEMY_DATABASE_URL)
 
 SessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
+replica_engine = None
+ReplicaSessionLocal = None
+replica_monitor = None
+if settings.SQLALCHEMY_REPLICA_DATABASE_URL:
+    replica_engine = build_engine(settings.SQLALCHEMY_REPLICA_DATABASE_URL)
+    ReplicaSessionLocal = async_sessionmaker(replica_engine, expire_on_commit=False)
+    replica_monitor = ReplicaLagMonitor(
+        replica_engine,
+        engine,
+        max_lag=settings.REPLICA_MAX_LAG,
+        check_interval=settings.REPLICA_LAG_CHECK_INTERVAL,
+    )
+
+
+def is_replica(db: AsyncSession) -> bool:
+    return replica_engine is not None and db.bind is replica_engine
+
 
 async def get_db():
     db = SessionLocal()
@@ -1,11 +1,21 @@
-from fastapi import Depends
+from typing import Optional
+from uuid import UUID
+
+from fastapi import Cookie, Depends
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app import database
 from app.database import get_db
 from app.handlers import RequestError
-from app.models import User
-from .utils import decodeAuth
+from .utils import (
+    WRITE_MARKER_COOKIE,
+    AuthUser,
+    decodeAuth,
+    decode_token_user_id,
+    has_recent_write,
+    unrevoked_token_user_id,
+)
 
 jwt_scheme = HTTPBearer(auto_error=False)
 
@@ -13,7 +23,7 @@ jwt_scheme = HTTPBearer(auto_error=False)
 async def get_user(
     token: HTTPAuthorizationCredentials = Depends(jwt_scheme),
     db: AsyncSession = Depends(get_db),
-) -> User:
+) -> AuthUser:
     if not token:
         raise RequestError(
             err_msg="Unauthorized User!",
@@ -26,3 +36,37 @@ async def get_user(
             status_code=401,
         )
     return user
+
+
+async def get_read_db(
+    token: HTTPAuthorizationCredentials = Depends(jwt_scheme),
+    db: AsyncSession = Depends(get_db),
+    write_marker: Optional[str] = Cookie(None, alias=WRITE_MARKER_COOKIE),
+):
+    # Read-only routes use the replica unless it is lagging or unreachable, or
+    # the caller wrote recently and must see their own changes. The write
+    # marker cookie carries that across workers
+    if not database.ReplicaSessionLocal:
+        yield db
+        return
+    if token:
+        user_id = decode_token_user_id(token.credentials)
+        if user_id and has_recent_write(user_id, write_marker):
+            yield db
+            return
+    if not await database.replica_monitor.is_usable():
+        yield db
+        return
+
+    async with database.ReplicaSessionLocal() as replica_db:
+        yield replica_db
+
+
+async def get_optional_user_id(
+    token: HTTPAuthorizationCredentials = Depends(jwt_scheme),
+) -> Optional[UUID]:
+    # Identifies the caller on public routes without a database lookup; a missing,
+    # invalid or revoked token is treated as an anonymous request
+    if not token:
+        return None
+    return unrevoked_token_user_id(token.credentials)
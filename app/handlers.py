@@ -17,10 +17,12 @@ class RequestError(Error):
         status_code: int = 400,
         data: dict = None,
         *args: object,
+        headers: dict = None,
     ) -> None:
         self.status_code = HTTPStatus(status_code)
         self.err_msg = err_msg
         self.data = data
+        self.headers = headers
 
         super().__init__(*args)
 
@@ -32,7 +34,9 @@ def request_error_handler(request, exc: RequestError):
     }
     if exc.data:
         err_dict["data"] = exc.data
-    return JSONResponse(status_code=exc.status_code, content=err_dict)
+    return JSONResponse(
+        status_code=exc.status_code, content=err_dict, headers=exc.headers
+    )
 
 
 def http_exception_handler(request, exc):
@@ -45,7 +49,7 @@ def http_exception_handler(request, exc):
 
 def validation_exception_handler(request, exc: RequestValidationError):
     # Get the original 'detail' list of errors
-    details = exc.raw_errors[0].exc.errors()
+    details = exc.errors()
     modified_details = {}
     for error in details:
         try:
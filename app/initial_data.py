@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import List, Union
 
@@ -6,7 +7,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.sql import exists
 from sqlalchemy.dialects.postgresql import insert
-from app.utils import get_password_hash
+from app.utils import get_password_hash_async
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -15,20 +16,24 @@ logger = logging.getLogger(__name__)
 async def create_initial_data(db: AsyncSession) -> None:
     logger.info("Creating initial data")
 
-    # Create users
-    users_to_create = [
-        {
-            "name": "John Doe",
-            "email": "johndoe@example.com",
-            "password": get_password_hash("johndoe"),
-        },
-        {
-            "name": "Jane Doe",
-            "email": "janedoe@example.com",
-            "password": get_password_hash("janedoe"),
-        },
-    ]
-    await check_and_bulk_create_data(db, User, users_to_create)
+    # Create users, hashing passwords only when they will actually be inserted
+    if not await has_data(db, User):
+        john_password, jane_password = await asyncio.gather(
+            get_password_hash_async("johndoe"), get_password_hash_async("janedoe")
+        )
+        users_to_create = [
+            {
+                "name": "John Doe",
+                "email": "johndoe@example.com",
+                "password": john_password,
+            },
+            {
+                "name": "Jane Doe",
+                "email": "janedoe@example.com",
+                "password": jane_password,
+            },
+        ]
+        await check_and_bulk_create_data(db, User, users_to_create)
 
     # Create articles
     articles_to_create = [
@@ -47,12 +52,16 @@ async def create_initial_data(db: AsyncSession) -> None:
     logger.info("Initial data created")
 
 
+async def has_data(db: AsyncSession, model: Union[Article, User]) -> bool:
+    return (
+        await db.execute(select(exists().where(model.__table__.c.id != None)))
+    ).scalar()
+
+
 async def check_and_bulk_create_data(
     db: AsyncSession, model: Union[Article, User], data: List
 ) -> None:
     # create articles if none in database
-    if not (
-        await db.execute(select(exists().where(model.__table__.c.id != None)))
-    ).scalar():
+    if not await has_data(db, model):
         await db.execute(insert(model).values(data).on_conflict_do_nothing())
         await db.commit()
@@ -0,0 +1,280 @@
+import asyncio
+import logging
+import uuid
+from collections import Counter, defaultdict
+from typing import Awaitable, Callable, Dict, Optional, Tuple, TypeVar
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.cache import response_cache
+from app.conf import settings
+from app.database import SessionLocal
+from app.queries import (
+    apply_likes_delta_query,
+    delete_likes_query,
+    insert_likes_query,
+    like_state_query,
+    liked_article_ids_query,
+    lock_articles_query,
+)
+
+logger = logging.getLogger(__name__)
+
+# Keeps every statement well below postgres' 65535 bind parameter limit
+FLUSH_CHUNK_SIZE = 1000
+# Consecutive failed flushes after which the buffered toggles are dropped, so
+# a batch that can never be written doesn't block every later one. Until then
+# the buffer stops accepting toggles, see LikeBuffer.accepting
+FLUSH_MAX_ATTEMPTS = 5
+
+LikeKey = Tuple[uuid.UUID, uuid.UUID]  # (user_id, article_id)
+T = TypeVar("T")
+
+
+class LikeBuffer:
+    """
+    Write-behind buffer for like toggles.
+
+    Toggles are coalesced in memory per (user, article), the last one winning,
+    and written by a background task in one transaction per flush using
+    multi-row INSERT ... ON CONFLICT and DELETE statements. A flush runs every
+    `interval` seconds, or earlier once `max_batch` toggles are buffered.
+
+    Durability: a toggle is acknowledged before it reaches the database, so
+    toggles buffered when the process dies without a graceful shutdown are lost,
+    as is a batch that failed FLUSH_MAX_ATTEMPTS flushes in a row. No toggles
+    are acknowledged from the buffer while a batch is failing.
+    Until the next flush, likes_count and liked_by_me reads served from the
+    database don't include them.
+    """
+
+    def __init__(
+        self, session_factory: async_sessionmaker, interval: float, max_batch: int
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.max_batch = max_batch
+        self.flushes = self.flushed = self.dropped = 0
+        self.failed_flushes = 0
+        # Desired like state, and the net counter change per article
+        self._pending: Dict[LikeKey, bool] = {}
+        self._deltas: Dict[uuid.UUID, int] = defaultdict(int)
+        # The batch currently being written
+        self._in_flight: Dict[LikeKey, bool] = {}
+        self._in_flight_deltas: Dict[uuid.UUID, int] = {}
+        self._lock = asyncio.Lock()
+        # Bumped whenever a flush moves toggles between the buffer and the
+        # database, and cleared while a flush commits, so toggles can tell
+        # whether the like state they read still matches the buffer
+        self._generation = 0
+        self._settled = asyncio.Event()
+        self._settled.set()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(self._pending)
+
+    @property
+    def accepting(self) -> bool:
+        # While a batch fails to flush, toggles are written synchronously with
+        # write_through/write_states instead of being acknowledged from a
+        # buffer that may drop them
+        return self.failed_flushes == 0
+
+    def _forget(self, key: LikeKey, liked_in_db: bool) -> None:
+        # Drops a buffered state that is about to be written synchronously.
+        # Only called under the flush lock, when nothing is in flight
+        if key in self._pending:
+            liked = self._pending.pop(key)
+            self._deltas[key[1]] -= int(liked) - int(liked_in_db)
+
+    async def write_through(
+        self, db: AsyncSession, slug: str, user_id: uuid.UUID
+    ) -> Optional[Tuple[bool, int]]:
+        # Like toggle, but written in db's transaction, which the caller commits.
+        # It toggles the state the caller last saw, buffered or not
+        async with self._lock:
+            row = (await db.execute(like_state_query(slug, user_id))).one_or_none()
+            if not row:
+                return None
+            article_id, likes_count, liked_in_db = row
+            key = (user_id, article_id)
+            liked = not self._pending.get(key, liked_in_db)
+            self._forget(key, liked_in_db)
+            await write_likes(db, {key: liked})
+        likes_count += int(liked) - int(liked_in_db) + self._deltas.get(article_id, 0)
+        return liked, max(likes_count, 0)
+
+    async def write_states(
+        self, db: AsyncSession, user_id: uuid.UUID, states: Dict[uuid.UUID, bool]
+    ) -> list:
+        # set_states, but written in db's transaction, which the caller commits.
+        # Returns the slugs of articles whose counter changed
+        async with self._lock:
+            query = liked_article_ids_query(user_id, list(states))
+            liked = set((await db.execute(query)).scalars().all())
+            for article_id in states:
+                self._forget((user_id, article_id), article_id in liked)
+            return await write_likes(
+                db,
+                {(user_id, article_id): state for article_id, state in states.items()},
+            )
+
+    async def toggle(
+        self, db: AsyncSession, slug: str, user_id: uuid.UUID
+    ) -> Optional[Tuple[bool, int]]:
+        # Returns (liked, likes_count) as seen by this worker, or None when the
+        # article doesn't exist
+        async def read():
+            return (await db.execute(like_state_query(slug, user_id))).one_or_none()
+
+        row = await self.consistent_read(read)
+        if not row:
+            return None
+        article_id, likes_count, liked_in_db = row
+
+        key = (user_id, article_id)
+        liked = not self._pending.get(key, self._in_flight.get(key, liked_in_db))
+        self._pending[key] = liked
+        self._deltas[article_id] += 1 if liked else -1
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+
+        likes_count += self._deltas[article_id]
+        likes_count += self._in_flight_deltas.get(article_id, 0)
+        return liked, max(likes_count, 0)
+
+    async def consistent_read(self, read: Callable[[], Awaitable[T]]) -> T:
+        # Runs `read` again if a flush moved toggles into or out of the database
+        # meanwhile. The caller must combine the result with the buffer without
+        # awaiting, so that it sees each toggle exactly once
+        while True:
+            await self._settled.wait()
+            generation = self._generation
+            result = await read()
+            if generation == self._generation and self._settled.is_set():
+                return result
+
+    async def set_states(
+        self, db: AsyncSession, user_id: uuid.UUID, states: Dict[uuid.UUID, bool]
+    ) -> set:
+        # Buffers explicit like (True) or unlike (False) states for a user's
+        # articles and returns the ids of articles whose state changed
+        async def read():
+            query = liked_article_ids_query(user_id, list(states))
+            return set((await db.execute(query)).scalars().all())
+
+        liked_in_db = await self.consistent_read(read)
+        changed = set()
+        for article_id, liked in states.items():
+            key = (user_id, article_id)
+            current = self._pending.get(
+                key, self._in_flight.get(key, article_id in liked_in_db)
+            )
+            if liked != current:
+                self._pending[key] = liked
+                self._deltas[article_id] += 1 if liked else -1
+                changed.add(article_id)
+        if len(self._pending) >= self.max_batch:
+            self._wake.set()
+        return changed
+
+    async def flush(self) -> int:
+        # Writes the buffered toggles in one transaction and returns how many were
+        # written. A failed batch is put back, with newer toggles taking precedence,
+        # and dropped after FLUSH_MAX_ATTEMPTS consecutive failures
+        async with self._lock:
+            if not self._pending:
+                return 0
+            self._in_flight, self._pending = self._pending, {}
+            self._in_flight_deltas, self._deltas = self._deltas, defaultdict(int)
+            self._generation += 1
+            try:
+                async with self.session_factory() as db:
+                    slugs = await write_likes(db, self._in_flight)
+                    self._settled.clear()
+                    await db.commit()
+                    # Toggles reading the new state mustn't add these again
+                    count = len(self._in_flight)
+                    self._in_flight, self._in_flight_deltas = {}, {}
+            except Exception:
+                logger.exception(f"Failed to flush {len(self._in_flight)} likes")
+                self.failed_flushes += 1
+                if self.failed_flushes >= FLUSH_MAX_ATTEMPTS:
+                    logger.error(
+                        f"Dropping {len(self._in_flight)} likes after "
+                        f"{self.failed_flushes} failed flushes"
+                    )
+                    self.dropped += len(self._in_flight)
+                    self.failed_flushes = 0
+                    return 0
+                self._pending = {**self._in_flight, **self._pending}
+                for article_id, delta in self._in_flight_deltas.items():
+                    self._deltas[article_id] += delta
+                return 0
+            finally:
+                self._in_flight, self._in_flight_deltas = {}, {}
+                self._generation += 1
+                self._settled.set()
+
+        self.failed_flushes = 0
+        self.flushes += 1
+        self.flushed += count
+        for slug in slugs:
+            await response_cache.invalidate_tag(f"article:{slug}")
+        return count
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        # Stops the flusher and writes whatever is still buffered
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+
+async def write_likes(db: AsyncSession, states: Dict[LikeKey, bool]) -> list:
+    # Applies the desired like states and returns the slugs of articles whose
+    # counter changed. Likes that already match are no-ops thanks to ON CONFLICT
+    # and the RETURNING counts, so replaying a batch is safe
+    added, removed = [], []
+    for key in sorted(states):
+        (added if states[key] else removed).append(key)
+
+    deltas = Counter()
+    await db.execute(lock_articles_query({article_id for _, article_id in states}))
+    for pairs, query, sign in [
+        (added, insert_likes_query, 1),
+        (removed, delete_likes_query, -1),
+    ]:
+        for start in range(0, len(pairs), FLUSH_CHUNK_SIZE):
+            result = await db.execute(query(pairs[start : start + FLUSH_CHUNK_SIZE]))
+            for article_id in result.scalars().all():
+                deltas[article_id] += sign
+
+    deltas = {article_id: delta for article_id, delta in deltas.items() if delta}
+    if not deltas:
+        return []
+    return (await db.execute(apply_likes_delta_query(deltas))).scalars().all()
+
+
+like_buffer = LikeBuffer(
+    SessionLocal, settings.LIKE_FLUSH_INTERVAL, settings.LIKE_FLUSH_MAX_BATCH
+)
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, Iterable, Optional, Set
+
+import orjson
+import psycopg
+from sqlalchemy.engine import make_url
+
+from app.conf import settings
+from app.queries import LIKES_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+class LikeCountSubscription:
+    """
+    Latest likes_count of each changed slug since the subscriber last read.
+    Updates arriving faster than the subscriber reads overwrite each other, so
+    a slow stream never holds more than one count per slug.
+    """
+
+    def __init__(self, slugs: Iterable[str]) -> None:
+        self.slugs = frozenset(slugs)
+        self._counts: Dict[str, int] = {}
+        self._changed = asyncio.Event()
+
+    def push(self, slug: str, likes_count: int) -> None:
+        self._counts[slug] = likes_count
+        self._changed.set()
+
+    async def get(self) -> Dict[str, int]:
+        await self._changed.wait()
+        self._changed.clear()
+        counts, self._counts = self._counts, {}
+        return counts
+
+
+class LikeCountListener:
+    """
+    A single LISTEN connection per worker, fanned out to every stream the
+    worker serves. Started by the first subscription; reconnects after errors.
+    Changes made while reconnecting are missed until the article changes again.
+    """
+
+    def __init__(self, url: str, reconnect_interval: float = 5) -> None:
+        self.url = url
+        self.reconnect_interval = reconnect_interval
+        self.subscriptions: Dict[str, Set[LikeCountSubscription]] = defaultdict(set)
+        self._task: Optional[asyncio.Task] = None
+
+    def __len__(self):
+        return len(set().union(*self.subscriptions.values()))
+
+    def subscribe(self, slugs: Iterable[str]) -> LikeCountSubscription:
+        subscription = LikeCountSubscription(slugs)
+        for slug in subscription.slugs:
+            self.subscriptions[slug].add(subscription)
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription: LikeCountSubscription) -> None:
+        for slug in subscription.slugs:
+            subscriptions = self.subscriptions.get(slug)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self.subscriptions[slug]
+
+    def dispatch(self, payload: str) -> None:
+        try:
+            data = orjson.loads(payload)
+            slug, likes_count = data["slug"], data["likes_count"]
+        except (orjson.JSONDecodeError, KeyError, TypeError):
+            logger.warning(f"Ignoring malformed {LIKES_CHANNEL} payload: {payload}")
+            return
+        for subscription in self.subscriptions.get(slug, ()):
+            subscription.push(slug, likes_count)
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                async with await psycopg.AsyncConnection.connect(
+                    self.url, autocommit=True
+                ) as conn:
+                    await conn.execute(f"LISTEN {LIKES_CHANNEL}")
+                    async for notify in conn.notifies():
+                        self.dispatch(notify.payload)
+            except Exception:
+                logger.exception("Like count listener disconnected")
+            await asyncio.sleep(self.reconnect_interval)
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def listener_url() -> str:
+    # psycopg takes a libpq URL, without SQLAlchemy's "+psycopg" driver suffix
+    url = make_url(settings.LIVE_LIKES_DATABASE_URL or settings.SQLALCHEMY_DATABASE_URL)
+    return url.set(drivername="postgresql").render_as_string(hide_password=False)
+
+
+like_count_listener = LikeCountListener(listener_url())
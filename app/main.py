@@ -1,21 +1,66 @@
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, ORJSONResponse, PlainTextResponse
 
-from app.schemas import ResponseSchema
+from app.schemas import (
+    CacheStatsResponseSchema,
+    PoolStatsResponseSchema,
+    ResponseSchema,
+)
 from .conf import settings
-from .initial_data import create_initial_data
 from .routes import router
 from .handlers import exc_handlers
-from .database import SessionLocal
+from .cache import MemoryResponseCache, response_cache
+from .database import (
+    SessionLocal,
+    engine,
+    pool_stats,
+    replica_engine,
+    warm_up_pool,
+)
+from .like_buffer import like_buffer
+from .live_likes import like_count_listener
+from .metrics import MetricsMiddleware, metrics
+from .profiling import SQLProfilingMiddleware
+from .rate_limit import RateLimitMiddleware
+from .revocation import revocations
+from .tasks import task_queue
+from .trending import trending_refresher
+from .utils import hashing_executor, user_cache
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    # Create initial data
-    async with SessionLocal() as db:
-        await create_initial_data(db)
+    # Startup does no blocking database work: migrations and demo data belong to
+    # the release step, and pools fill in the background while we start serving
+    if settings.SEED_INITIAL_DATA:
+        from .initial_data import create_initial_data
+
+        async with SessionLocal() as db:
+            await create_initial_data(db)
+    warm_ups = []
+    if settings.DB_POOL_WARM_UP:
+        for db_engine in filter(None, [engine, replica_engine]):
+            pool_size = db_engine.pool.size()
+            warm_ups.append(asyncio.create_task(warm_up_pool(db_engine, pool_size)))
+    if settings.LIKE_WRITE_BEHIND:
+        like_buffer.start()
+    trending_refresher.start()
+    task_queue.start()
+    # Every authenticated request checks revocations, stateless or not
+    revocations.start()
     yield
+    await revocations.stop()
+    await like_count_listener.stop()
+    for warm_up in warm_ups:
+        warm_up.cancel()
+    await trending_refresher.stop()
+    # Buffered likes are only durable once flushed
+    await like_buffer.stop()
+    await task_queue.stop(settings.TASK_DRAIN_TIMEOUT)
+    hashing_executor.shutdown(wait=False, cancel_futures=True)
 
 
 app = FastAPI(
@@ -36,8 +81,12 @@ app = FastAPI(
     security=[{"BearerToken": []}],
     exception_handlers=exc_handlers,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse if settings.FAST_JSON else JSONResponse,
 )
 
+# Inside CORS, so that rejected requests still carry CORS headers
+app.add_middleware(RateLimitMiddleware)
+
 # Set all CORS enabled origins
 app.add_middleware(
     CORSMiddleware,
@@ -56,6 +105,10 @@ app.add_middleware(
     ],
 )
 
+app.add_middleware(SQLProfilingMiddleware)
+# Outermost, so its latency covers the other middleware too
+app.add_middleware(MetricsMiddleware)
+
 app.include_router(router, prefix="/api/v1")
 
 
@@ -70,3 +123,51 @@ app.include_router(router, prefix="/api/v1")
 )
 async def healthcheck() -> ResponseSchema:
     return {"message": "pong!"}
+
+
+@app.get(
+    "/api/v1/healthcheck/caches",
+    name="Cache stats",
+    tags=["Healthcheck"],
+    description="""
+        ****
+        Returns size and hit/miss counters of this worker's in-process caches
+    """,
+)
+async def cache_stats() -> CacheStatsResponseSchema:
+    data = {"auth_user": user_cache.stats()}
+    if isinstance(response_cache, MemoryResponseCache):
+        data["response"] = response_cache.stats()
+    return {"message": "Cache stats fetched successfully", "data": data}
+
+
+@app.get(
+    "/api/v1/healthcheck/db-pool",
+    name="Database pool stats",
+    tags=["Healthcheck"],
+    description="""
+        ****
+        Returns this worker's database connection pool usage and checkout wait times
+    """,
+)
+async def db_pool_stats() -> PoolStatsResponseSchema:
+    data = {"primary": pool_stats(engine)}
+    if replica_engine:
+        data["replica"] = pool_stats(replica_engine)
+    return {"message": "Database pool stats fetched successfully", "data": data}
+
+
+@app.get(
+    "/metrics",
+    name="Metrics",
+    tags=["Healthcheck"],
+    description="""
+        ****
+        Returns this worker's request and database metrics in the Prometheus text format
+    """,
+    response_class=PlainTextResponse,
+)
+async def metrics_view() -> PlainTextResponse:
+    return PlainTextResponse(
+        metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
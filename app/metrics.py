@@ -0,0 +1,211 @@
+import time
+from bisect import bisect_left
+from collections import defaultdict
+from contextvars import ContextVar
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.routing import Match
+
+from app.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+UNMATCHED_ROUTE = "unmatched"
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class QueryStats:
+    """Queries executed while handling the current request"""
+
+    __slots__ = ("count", "duration")
+
+    def __init__(self) -> None:
+        self.count = 0
+        self.duration = 0.0
+
+    def record(self, statement: str, duration: float, rowcount: int) -> None:
+        self.count += 1
+        self.duration += duration
+
+
+# Set per request by MetricsMiddleware. The async engine runs cursor calls in
+# greenlets that share the calling task's context, so events can see it
+current_query_stats: ContextVar[Optional[QueryStats]] = ContextVar(
+    "current_query_stats", default=None
+)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_query_stats.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_query_stats.get()
+    if stats is not None and conn.info.get("query_started"):
+        duration = time.perf_counter() - conn.info["query_started"].pop()
+        stats.record(statement, duration, cursor.rowcount)
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: Iterable[float]) -> None:
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        # Buckets are upper bounds, the extra slot is +Inf
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Per-process request and database metrics, rendered in the Prometheus text
+    exposition format. Each worker keeps its own registry.
+    """
+
+    def __init__(self) -> None:
+        self.requests: Dict[Labels, int] = defaultdict(int)
+        self.in_progress: Dict[Labels, int] = defaultdict(int)
+        self.latency: Dict[Labels, Histogram] = {}
+        self.db_queries: Dict[Labels, Histogram] = {}
+        self.db_duration: Dict[Labels, Histogram] = {}
+
+    def observe(
+        self,
+        labels: Labels,
+        status: int,
+        duration: float,
+        query_stats: QueryStats,
+    ) -> None:
+        self.requests[labels + (("status", str(status)),)] += 1
+        for histograms, buckets, value in [
+            (self.latency, LATENCY_BUCKETS, duration),
+            (self.db_queries, QUERY_COUNT_BUCKETS, query_stats.count),
+            (self.db_duration, LATENCY_BUCKETS, query_stats.duration),
+        ]:
+            if labels not in histograms:
+                histograms[labels] = Histogram(buckets)
+            histograms[labels].observe(value)
+
+    def clear(self) -> None:
+        self.__init__()
+
+    def render(self) -> str:
+        lines: List[str] = []
+        metric(
+            lines,
+            "http_requests_total",
+            "counter",
+            "Total HTTP requests by route template and status",
+            self.requests,
+        )
+        metric(
+            lines,
+            "http_requests_in_progress",
+            "gauge",
+            "HTTP requests currently being handled",
+            self.in_progress,
+        )
+        histogram(
+            lines,
+            "http_request_duration_seconds",
+            "HTTP request latency",
+            self.latency,
+        )
+        histogram(
+            lines,
+            "http_request_db_queries",
+            "Database queries executed per request",
+            self.db_queries,
+        )
+        histogram(
+            lines,
+            "http_request_db_duration_seconds",
+            "Time spent executing database queries per request",
+            self.db_duration,
+        )
+        return "\n".join(lines) + "\n"
+
+
+def escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    pairs = ",".join(f'{name}="{escape(value)}"' for name, value in labels)
+    return "{" + pairs + "}"
+
+
+def metric(lines: List[str], name: str, kind: str, help: str, samples: dict) -> None:
+    lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    for labels, value in samples.items():
+        lines.append(f"{name}{format_labels(labels)} {value}")
+
+
+def histogram(lines: List[str], name: str, help: str, samples: dict) -> None:
+    lines += [f"# HELP {name} {help}", f"# TYPE {name} histogram"]
+    for labels, hist in samples.items():
+        total = 0
+        for bound, count in zip(hist.buckets + ("+Inf",), hist.counts):
+            total += count
+            bucket_labels = format_labels(labels + (("le", str(bound)),))
+            lines.append(f"{name}_bucket{bucket_labels} {total}")
+        lines.append(f"{name}_sum{format_labels(labels)} {hist.sum}")
+        lines.append(f"{name}_count{format_labels(labels)} {hist.count}")
+
+
+def route_template(scope) -> str:
+    # Label requests by the matched route's path template (/articles/{slug}),
+    # never the raw path, so label cardinality stays bounded
+    for route in scope["app"].router.routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+    return UNMATCHED_ROUTE
+
+
+class MetricsMiddleware:
+    def __init__(self, app, registry: Optional[MetricsRegistry] = None) -> None:
+        self.app = app
+        self.registry = registry or metrics
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.METRICS_ENABLED:
+            return await self.app(scope, receive, send)
+
+        labels = (("method", scope["method"]), ("route", route_template(scope)))
+        status = 500
+        query_stats = QueryStats()
+        token = current_query_stats.set(query_stats)
+        self.registry.in_progress[labels] += 1
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            self.registry.in_progress[labels] -= 1
+            current_query_stats.reset(token)
+            self.registry.observe(labels, status, duration, query_stats)
+
+
+metrics = MetricsRegistry()
@@ -0,0 +1,41 @@
+"""Article likes count
+
+Revision ID: 139ff949f8a3
+Revises: e0020fe1f799
+Create Date: 2026-10-18 09:12:41.503218
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "139ff949f8a3"
+down_revision: Union[str, None] = "e0020fe1f799"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "articles",
+        sa.Column("likes_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    # Backfill the counter from existing likes
+    op.execute(
+        """
+        UPDATE articles
+        SET likes_count = counts.total
+        FROM (
+            SELECT article_id, COUNT(*) AS total FROM likes GROUP BY article_id
+        ) AS counts
+        WHERE counts.article_id = articles.id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("articles", "likes_count")
@@ -0,0 +1,41 @@
+"""Articles keyset index
+
+Revision ID: 5db6bf016c29
+Revises: 139ff949f8a3
+Create Date: 2026-10-18 10:04:17.228391
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "5db6bf016c29"
+down_revision: Union[str, None] = "139ff949f8a3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # created_at is part of the page cursor, and rows with NULL would never
+    # match the keyset comparison
+    op.execute(
+        "UPDATE articles SET created_at = COALESCE(updated_at, now()) "
+        "WHERE created_at IS NULL"
+    )
+    op.alter_column(
+        "articles", "created_at", existing_type=sa.DateTime(), nullable=False
+    )
+    op.create_index(
+        "ix_articles_created_at_id", "articles", ["created_at", "id"], unique=False
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_articles_created_at_id", table_name="articles")
+    op.alter_column(
+        "articles", "created_at", existing_type=sa.DateTime(), nullable=True
+    )
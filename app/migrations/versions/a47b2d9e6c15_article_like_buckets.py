@@ -0,0 +1,45 @@
+"""Article like buckets
+
+Revision ID: a47b2d9e6c15
+Revises: 8c3e1f7a9d42
+Create Date: 2026-10-18 12:26:53.870114
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "a47b2d9e6c15"
+down_revision: Union[str, None] = "8c3e1f7a9d42"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "article_like_buckets",
+        sa.Column("article_id", sa.UUID(), nullable=False),
+        sa.Column("bucket_start", sa.DateTime(), nullable=False),
+        sa.Column("likes", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["article_id"], ["articles.id"], ondelete="CASCADE"),
+        sa.PrimaryKeyConstraint("article_id", "bucket_start"),
+    )
+    op.create_index(
+        "ix_article_like_buckets_bucket_start",
+        "article_like_buckets",
+        ["bucket_start"],
+        unique=False,
+    )
+    op.create_index("ix_likes_created_at", "likes", ["created_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_likes_created_at", table_name="likes")
+    op.drop_index(
+        "ix_article_like_buckets_bucket_start", table_name="article_like_buckets"
+    )
+    op.drop_table("article_like_buckets")
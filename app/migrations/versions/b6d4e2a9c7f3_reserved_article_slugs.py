@@ -0,0 +1,38 @@
+"""Reserved article slugs
+
+Revision ID: b6d4e2a9c7f3
+Revises: f3a9c6d2b8e1
+Create Date: 2026-10-18 19:02:37.518204
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = "b6d4e2a9c7f3"
+down_revision: Union[str, None] = "f3a9c6d2b8e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Articles created before the slugs were reserved keep a unique, routable slug
+    op.execute(
+        "UPDATE articles SET slug = slug || '-' || left(id::text, 8) "
+        "WHERE slug IN ('search', 'trending')"
+    )
+    # NOT VALID skips the scan under the exclusive lock; VALIDATE scans without
+    # blocking writes
+    op.execute(
+        "ALTER TABLE articles ADD CONSTRAINT article_slug_not_reserved "
+        "CHECK (slug NOT IN ('search', 'trending')) NOT VALID"
+    )
+    op.execute("ALTER TABLE articles VALIDATE CONSTRAINT article_slug_not_reserved")
+
+
+def downgrade() -> None:
+    op.drop_constraint("article_slug_not_reserved", "articles", type_="check")
@@ -0,0 +1,34 @@
+"""Seed progress
+
+Revision ID: f3a9c6d2b8e1
+Revises: d81a4c6f2e07
+Create Date: 2026-10-18 17:41:09.214386
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "f3a9c6d2b8e1"
+down_revision: Union[str, None] = "d81a4c6f2e07"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Used to be created on the fly by app.seeding, so it may already exist
+    op.create_table(
+        "seed_progress",
+        sa.Column("run_key", sa.Text(), nullable=False),
+        sa.Column("kind", sa.Text(), nullable=False),
+        sa.Column("batches_done", sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint("run_key", "kind"),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("seed_progress")
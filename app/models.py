@@ -1,17 +1,34 @@
 from datetime import datetime
+from typing import Optional
 from sqlalchemy import (
+    CheckConstraint,
     Column,
+    Computed,
     DateTime,
     ForeignKey,
+    Index,
+    Integer,
     String,
     Text,
     UniqueConstraint,
 )
-from sqlalchemy.dialects.postgresql import UUID
-from sqlalchemy.orm import Mapped, relationship
+from sqlalchemy.dialects.postgresql import JSONB, TSVECTOR, UUID
+from sqlalchemy.orm import Mapped, deferred, relationship, validates
 from .database import Base
 import uuid
 
+# Text search configuration of Article.search_vector and search queries
+SEARCH_CONFIG = "english"
+
+# Slugs whose GET /articles/{slug} is shadowed by another /articles/ route
+RESERVED_SLUGS = frozenset({"search", "trending"})
+
+
+def check_slug(slug: str) -> str:
+    if slug in RESERVED_SLUGS:
+        raise ValueError(f"Slug {slug!r} is reserved")
+    return slug
+
 
 class BaseModel(Base):
     __abstract__ = True
@@ -39,15 +56,46 @@ class Article(BaseModel):
     title: Mapped[str] = Column(String(500))
     slug: Mapped[str] = Column(String, unique=True, index=True)
     desc: Mapped[str] = Column(Text())
-    likes = relationship("Like", back_populates="article", lazy="joined")
+    # Part of the page cursor, so it can't be NULL
+    created_at: Mapped[datetime] = Column(
+        DateTime, default=datetime.now, nullable=False
+    )
+    # Denormalized counter maintained by the like endpoint so reads never touch likes
+    likes_count: Mapped[int] = Column(
+        Integer, default=0, server_default="0", nullable=False
+    )
+    # Maintained by postgres for full-text search; titles rank above descriptions
+    search_vector: Mapped[str] = deferred(
+        Column(
+            TSVECTOR,
+            Computed(
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+                f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(\"desc\", '')), 'B')",
+                persisted=True,
+            ),
+        )
+    )
+    likes = relationship("Like", back_populates="article", lazy="raise")
+
+    __table_args__ = (
+        # Supports keyset pagination ordered by (created_at, id)
+        Index("ix_articles_created_at_id", "created_at", "id"),
+        Index("ix_articles_search_vector", "search_vector", postgresql_using="gin"),
+        # Also covers rows written without the ORM, e.g. by app.seeding
+        CheckConstraint(
+            "slug NOT IN (%s)"
+            % ", ".join(f"'{slug}'" for slug in sorted(RESERVED_SLUGS)),
+            name="article_slug_not_reserved",
+        ),
+    )
+
+    @validates("slug")
+    def validate_slug(self, key: str, slug: str) -> str:
+        return check_slug(slug)
 
     def __repr__(self):
         return self.title
 
-    @property
-    def likes_count(self):
-        return len(self.likes)
-
 
 class Like(BaseModel):
     __tablename__ = "likes"
@@ -60,9 +108,63 @@ class Like(BaseModel):
         ForeignKey("articles.id", ondelete="CASCADE"),
     )
 
-    # Ensures a user can like an article only once
     __table_args__ = (
+        # Ensures a user can like an article only once
         UniqueConstraint("user_id", "article_id", name="unique_user_article_like"),
+        # Lets the trending refresh read only recent likes
+        Index("ix_likes_created_at", "created_at"),
     )
 
     article = relationship("Article", back_populates="likes")
+
+
+class ArticleLikeBucket(Base):
+    """Likes an article received per hour, maintained by app.trending"""
+
+    __tablename__ = "article_like_buckets"
+    article_id: Mapped[uuid.UUID] = Column(
+        UUID(),
+        ForeignKey("articles.id", ondelete="CASCADE"),
+        primary_key=True,
+    )
+    bucket_start: Mapped[datetime] = Column(DateTime, primary_key=True)
+    likes: Mapped[int] = Column(Integer, nullable=False)
+
+    __table_args__ = (Index("ix_article_like_buckets_bucket_start", "bucket_start"),)
+
+
+class RevokedToken(BaseModel):
+    """
+    Revokes a single token (jti) or every token a user was issued before
+    created_at (user_id). user_id has no foreign key so that revocations
+    outlive deleted users.
+    """
+
+    __tablename__ = "revoked_tokens"
+    jti: Mapped[Optional[str]] = Column(String(32), index=True)
+    user_id: Mapped[Optional[uuid.UUID]] = Column(UUID(), index=True)
+
+
+class BackgroundTask(BaseModel):
+    """A task of the postgres task queue, see app.tasks"""
+
+    __tablename__ = "background_tasks"
+    name: Mapped[str] = Column(String(100), nullable=False)
+    payload: Mapped[dict] = Column(JSONB, nullable=False)
+    attempts: Mapped[int] = Column(
+        Integer, default=0, server_default="0", nullable=False
+    )
+    # When the task may next be claimed: on creation, after a retry backoff or
+    # once the lease of the worker running it runs out
+    run_at: Mapped[datetime] = Column(
+        DateTime, default=datetime.now, nullable=False, index=True
+    )
+
+
+class SeedProgress(Base):
+    """Batches of a table copied by a seed run, so app.seeding can resume it"""
+
+    __tablename__ = "seed_progress"
+    run_key: Mapped[str] = Column(Text, primary_key=True)
+    kind: Mapped[str] = Column(Text, primary_key=True)
+    batches_done: Mapped[int] = Column(Integer, nullable=False)
@@ -0,0 +1,109 @@
+import hmac
+import logging
+from collections import Counter
+from typing import Callable, List, Optional, Tuple
+
+from app.conf import settings
+from app.metrics import QueryStats, current_query_stats, route_template
+
+logger = logging.getLogger(__name__)
+
+PROFILE_HEADER = "x-profile-sql"
+
+
+class QueryProfile(QueryStats):
+    """
+    Every statement executed while handling a request, with its duration and
+    row count. Recording is forwarded to the metrics stats it replaces.
+    """
+
+    __slots__ = ("parent", "queries")
+
+    def __init__(self, parent: Optional[QueryStats] = None) -> None:
+        super().__init__()
+        self.parent = parent
+        self.queries: List[Tuple[str, float, int]] = []
+
+    def record(self, statement: str, duration: float, rowcount: int) -> None:
+        super().record(statement, duration, rowcount)
+        self.queries.append((statement, duration, rowcount))
+        if self.parent:
+            self.parent.record(statement, duration, rowcount)
+
+    def repeated(self) -> List[Tuple[str, int]]:
+        # Identical SQL run over and over is the signature of an N+1 loop, since
+        # parameters are bound separately from the statement text
+        counts = Counter(statement for statement, _, _ in self.queries)
+        threshold = settings.SQL_REPEATED_QUERY_THRESHOLD
+        return [(sql, count) for sql, count in counts.items() if count >= threshold]
+
+    def row_blowups(self) -> List[Tuple[str, int]]:
+        threshold = settings.SQL_ROW_COUNT_THRESHOLD
+        return [
+            (statement, rowcount)
+            for statement, _, rowcount in self.queries
+            if rowcount >= threshold
+        ]
+
+    def server_timing(self) -> str:
+        entries = [f'db;dur={self.duration * 1000:.2f};desc="{self.count} queries"']
+        if repeated := self.repeated():
+            entries.append(f'db-repeated;desc="{len(repeated)} repeated statements"')
+        if blowups := self.row_blowups():
+            rows = max(rowcount for _, rowcount in blowups)
+            entries.append(f'db-rows;desc="{rows} rows in one statement"')
+        return ", ".join(entries)
+
+
+# Called with (endpoint, profile) after every profiled request. While any are
+# registered every request is profiled; used by the query budget test plugin
+profile_observers: List[Callable[[str, QueryProfile], None]] = []
+
+
+def profiling_requested(scope) -> bool:
+    if settings.DEBUG or profile_observers:
+        return True
+    token = settings.SQL_PROFILE_TOKEN
+    if not token:
+        return False
+    for name, value in scope["headers"]:
+        if name == PROFILE_HEADER.encode():
+            return hmac.compare_digest(value, token.encode())
+    return False
+
+
+class SQLProfilingMiddleware:
+    """
+    Profiles the SQL of requests when DEBUG is on, or when the request sends
+    the X-Profile-SQL header with SQL_PROFILE_TOKEN. The summary is returned in
+    a Server-Timing header and suspicious patterns are logged.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not profiling_requested(scope):
+            return await self.app(scope, receive, send)
+
+        profile = QueryProfile(current_query_stats.get())
+        token = current_query_stats.set(profile)
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", profile.server_timing().encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            current_query_stats.reset(token)
+            endpoint = f"{scope['method']} {route_template(scope)}"
+            for statement, count in profile.repeated():
+                logger.warning(f"{endpoint} ran {count} times: {statement}")
+            for statement, rowcount in profile.row_blowups():
+                logger.warning(f"{endpoint} returned {rowcount} rows: {statement}")
+            for observer in profile_observers:
+                observer(endpoint, profile)
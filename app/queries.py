@@ -0,0 +1,274 @@
+import uuid
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import (
+    Double,
+    Integer,
+    Select,
+    Text,
+    cast,
+    column,
+    delete,
+    exists,
+    func,
+    literal,
+    literal_column,
+    select,
+    tuple_,
+    update,
+    values,
+)
+from sqlalchemy.dialects.postgresql import insert
+
+from app.models import SEARCH_CONFIG, Article, ArticleLikeBucket, Like, User
+
+# Columns rendered by ArticleSchema. Read queries select only these and return
+# Row tuples, so no ORM instances are built or tracked by the session
+ARTICLE_FIELDS = ("title", "slug", "desc", "likes_count", "created_at", "updated_at")
+ARTICLE_COLUMNS = tuple(getattr(Article, field) for field in ARTICLE_FIELDS)
+# Postgres channel carrying {"slug", "likes_count"} after every counter change
+LIKES_CHANNEL = "article_likes"
+
+
+def articles_page_query(
+    position: Optional[Tuple[datetime, uuid.UUID]], limit: int
+) -> Select:
+    # Rows end with the id, which together with created_at forms the page cursor
+    query = select(*ARTICLE_COLUMNS, Article.id).order_by(
+        Article.created_at.desc(), Article.id.desc()
+    )
+    if position:
+        # Seek past the last item of the previous page using the composite index
+        query = query.where(tuple_(Article.created_at, Article.id) < position)
+    return query.limit(limit)
+
+
+def article_detail_query(slug: str) -> Select:
+    return select(*ARTICLE_COLUMNS).where(Article.slug == slug)
+
+
+def liked_slugs_query(user_id: uuid.UUID, slugs: Iterable[str]) -> Select:
+    # Answered from the unique (user_id, article_id) index and the slug index
+    return (
+        select(Article.slug)
+        .join(Like, Like.article_id == Article.id)
+        .where(Like.user_id == user_id, Article.slug.in_(slugs))
+    )
+
+
+def article_ids_query(slugs: Iterable[str]) -> Select:
+    return select(Article.slug, Article.id).where(Article.slug.in_(slugs))
+
+
+def likes_counts_query(slugs: Iterable[str]) -> Select:
+    return select(Article.slug, Article.likes_count).where(Article.slug.in_(slugs))
+
+
+def liked_article_ids_query(
+    user_id: uuid.UUID, article_ids: Iterable[uuid.UUID]
+) -> Select:
+    return select(Like.article_id).where(
+        Like.user_id == user_id, Like.article_id.in_(article_ids)
+    )
+
+
+def login_user_query(email: str) -> Select:
+    return select(User.id, User.name, User.email, User.password).where(
+        User.email == email
+    )
+
+
+def notify_likes_count():
+    # Returned by the statements that change articles.likes_count. Postgres
+    # delivers the notification to listeners once the transaction commits
+    payload = func.json_build_object(
+        literal_column("'slug'"),
+        Article.slug,
+        literal_column("'likes_count'"),
+        Article.likes_count,
+    )
+    return func.pg_notify(
+        literal_column(f"'{LIKES_CHANNEL}'"), cast(payload, Text)
+    ).label("notified")
+
+
+def toggle_like_query(slug: str, user_id: uuid.UUID) -> Select:
+    """
+    Likes or unlikes an article in a single atomic statement.
+
+    Deletes the user's like if it exists, otherwise inserts one, and applies the
+    difference to articles.likes_count. Yields one (liked, likes_count) row, or
+    no row when the slug doesn't exist.
+    """
+    now = datetime.now()
+    # Locks the article before any like row, the order write_likes takes too,
+    # so that toggles and batch writes on the same article can't deadlock
+    article = (
+        select(Article.id).where(Article.slug == slug).with_for_update().cte("article")
+    )
+    removed = (
+        delete(Like)
+        .where(Like.article_id == article.c.id, Like.user_id == user_id)
+        .returning(Like.id)
+        .cte("removed")
+    )
+    # A concurrent toggle that already inserted the like makes this a no-op
+    added = (
+        insert(Like)
+        .from_select(
+            ["id", "user_id", "article_id", "created_at", "updated_at"],
+            select(
+                literal(uuid.uuid4(), Like.id.type),
+                literal(user_id, Like.user_id.type),
+                article.c.id,
+                literal(now),
+                literal(now),
+            ).where(~exists(select(removed.c.id))),
+        )
+        .on_conflict_do_nothing(constraint="unique_user_article_like")
+        .returning(Like.id)
+        .cte("added")
+    )
+    added_count = select(func.count()).select_from(added).scalar_subquery()
+    removed_count = select(func.count()).select_from(removed).scalar_subquery()
+    counted = (
+        update(Article)
+        .where(Article.id == article.c.id)
+        .values(
+            likes_count=Article.likes_count + added_count - removed_count,
+            updated_at=Article.updated_at,
+        )
+        .returning(Article.likes_count, notify_likes_count())
+        .cte("counted")
+    )
+    return select((removed_count == 0).label("liked"), counted.c.likes_count)
+
+
+def search_articles_query(
+    q: str,
+    boost_likes: bool,
+    position: Optional[Tuple[float, uuid.UUID]],
+    limit: int,
+) -> Select:
+    """
+    Articles matching a web-style search query (quoted phrases, OR, -word),
+    best match first. Matches are found through the GIN index on
+    search_vector and rows end with (rank, id), which form the page cursor.
+    """
+    query = func.websearch_to_tsquery(literal_column(f"'{SEARCH_CONFIG}'"), q)
+    # Doubles so the rank survives the round trip through the cursor exactly
+    rank = func.ts_rank_cd(Article.search_vector, query).cast(Double)
+    if boost_likes:
+        rank = rank * (1 + func.ln(1 + Article.likes_count.cast(Double)))
+
+    statement = (
+        select(*ARTICLE_COLUMNS, rank.label("rank"), Article.id)
+        .where(Article.search_vector.op("@@")(query))
+        .order_by(rank.desc(), Article.id.desc())
+    )
+    if position:
+        statement = statement.where(tuple_(rank, Article.id) < position)
+    return statement.limit(limit)
+
+
+def trending_articles_query(since: datetime, limit: int) -> Select:
+    # Ranks articles by the likes in their hourly buckets since `since`, reading
+    # only the small bucket table instead of aggregating likes per request
+    recent_likes = func.sum(ArticleLikeBucket.likes).label("recent_likes")
+    return (
+        select(*ARTICLE_COLUMNS, recent_likes)
+        .join(ArticleLikeBucket, ArticleLikeBucket.article_id == Article.id)
+        .where(ArticleLikeBucket.bucket_start >= since)
+        .group_by(Article.id)
+        .order_by(recent_likes.desc(), Article.id.desc())
+        .limit(limit)
+    )
+
+
+def clear_like_buckets_query(since: datetime, expired_before: datetime):
+    # Buckets about to be recomputed, and buckets older than any trending window
+    return delete(ArticleLikeBucket).where(
+        (ArticleLikeBucket.bucket_start >= since)
+        | (ArticleLikeBucket.bucket_start < expired_before)
+    )
+
+
+def fill_like_buckets_query(since: datetime):
+    # Counts the likes that exist now per article per hour, from `since` onwards
+    bucket_start = func.date_trunc(literal_column("'hour'"), Like.created_at)
+    return insert(ArticleLikeBucket).from_select(
+        ["article_id", "bucket_start", "likes"],
+        select(Like.article_id, bucket_start, func.count())
+        .where(Like.created_at >= since)
+        .group_by(Like.article_id, bucket_start),
+    )
+
+
+def like_state_query(slug: str, user_id: uuid.UUID) -> Select:
+    # (article id, likes_count, liked) for the write-behind buffer, without locking
+    liked = exists().where(Like.article_id == Article.id, Like.user_id == user_id)
+    return select(Article.id, Article.likes_count, liked.label("liked")).where(
+        Article.slug == slug
+    )
+
+
+def insert_likes_query(pairs: List[Tuple[uuid.UUID, uuid.UUID]]):
+    # Multi-row insert of (user_id, article_id) pairs; rows of likes that already
+    # exist are skipped and only inserted rows are returned. Pairs are joined to
+    # users and articles so that ones deleted since they were buffered are
+    # skipped too, instead of failing the batch on the foreign keys
+    now = datetime.now()
+    rows = values(
+        column("id", Like.id.type),
+        column("user_id", Like.user_id.type),
+        column("article_id", Like.article_id.type),
+        name="pairs",
+    ).data([(uuid.uuid4(), user_id, article_id) for user_id, article_id in pairs])
+    existing = (
+        select(rows.c.id, rows.c.user_id, rows.c.article_id, literal(now), literal(now))
+        .join(User, User.id == rows.c.user_id)
+        .join(Article, Article.id == rows.c.article_id)
+    )
+    return (
+        insert(Like)
+        .from_select(
+            ["id", "user_id", "article_id", "created_at", "updated_at"], existing
+        )
+        .on_conflict_do_nothing(constraint="unique_user_article_like")
+        .returning(Like.article_id)
+    )
+
+
+def delete_likes_query(pairs: List[Tuple[uuid.UUID, uuid.UUID]]):
+    return (
+        delete(Like)
+        .where(tuple_(Like.user_id, Like.article_id).in_(pairs))
+        .returning(Like.article_id)
+    )
+
+
+def lock_articles_query(article_ids: Iterable[uuid.UUID]) -> Select:
+    # Row locks taken in id order so concurrent batch flushes can't deadlock
+    return (
+        select(Article.id)
+        .where(Article.id.in_(article_ids))
+        .order_by(Article.id)
+        .with_for_update()
+    )
+
+
+def apply_likes_delta_query(deltas: Dict[uuid.UUID, int]):
+    # Adds each article's delta to its counter in one UPDATE ... FROM (VALUES ...)
+    rows = values(
+        column("article_id", Article.id.type), column("delta", Integer), name="deltas"
+    ).data(list(deltas.items()))
+    return (
+        update(Article)
+        .where(Article.id == rows.c.article_id)
+        .values(
+            likes_count=Article.likes_count + rows.c.delta,
+            updated_at=Article.updated_at,
+        )
+        .returning(Article.slug, notify_likes_count())
+    )
@@ -0,0 +1,166 @@
+import logging
+import math
+import time
+from collections import OrderedDict
+from typing import Any, Optional, Tuple, Union
+
+from app.conf import settings
+from app.database import engine
+from app.handlers import RequestError, request_error_handler
+from app.metrics import route_template
+from app.utils import decode_token_user_id
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryRateLimiter:
+    """
+    Token buckets kept by this worker, so each worker enforces the full limit.
+    The least recently used buckets are dropped beyond `max_keys`.
+    """
+
+    def __init__(self, max_keys: int) -> None:
+        self.max_keys = max_keys
+        self.buckets: OrderedDict[str, Tuple[float, float]] = OrderedDict()
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        # Takes a token and returns 0, or returns the seconds until one is available
+        now = time.monotonic()
+        tokens, updated = self.buckets.pop(key, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate)
+        wait = 0.0
+        if tokens >= 1:
+            tokens -= 1
+        else:
+            wait = (1 - tokens) / rate
+        self.buckets[key] = (tokens, now)
+        if len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+        return wait
+
+    async def clear(self) -> None:
+        self.buckets.clear()
+
+
+class RedisRateLimiter:
+    """
+    Token buckets shared by all workers, updated atomically by a Lua script
+    using the redis server's clock. Requests are let through if redis fails.
+    """
+
+    SCRIPT = """
+        local rate, burst = tonumber(ARGV[1]), tonumber(ARGV[2])
+        local time = redis.call('TIME')
+        local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+        local tokens = tonumber(bucket[1]) or burst
+        local updated = tonumber(bucket[2]) or now
+        tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+        local wait = 0
+        if tokens >= 1 then
+            tokens = tokens - 1
+        else
+            wait = (1 - tokens) / rate
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+        redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+        return tostring(wait)
+    """
+
+    def __init__(self, client: Any, prefix: str = "norebase:ratelimit:") -> None:
+        self.client = client
+        self.prefix = prefix
+        self.script = client.register_script(self.SCRIPT)
+
+    async def acquire(self, key: str, rate: float, burst: int) -> float:
+        try:
+            wait = await self.script(keys=[f"{self.prefix}{key}"], args=[rate, burst])
+        except Exception:
+            logger.exception("Rate limiter unavailable, letting request through")
+            return 0.0
+        return float(wait)
+
+    async def clear(self) -> None:
+        keys = [key async for key in self.client.scan_iter(match=f"{self.prefix}*")]
+        if keys:
+            await self.client.delete(*keys)
+
+
+def create_rate_limiter() -> Union[MemoryRateLimiter, RedisRateLimiter]:
+    if settings.RATE_LIMIT_BACKEND == "redis":
+        # Optional dependency, only needed when the redis backend is selected
+        import redis.asyncio as redis
+
+        return RedisRateLimiter(redis.from_url(settings.RATE_LIMIT_REDIS_URL))
+    return MemoryRateLimiter(max_keys=settings.RATE_LIMIT_MAX_KEYS)
+
+
+rate_limiter = create_rate_limiter()
+
+
+def client_key(scope) -> str:
+    # Authenticated clients are limited per user, anyone else per IP address.
+    # The token is only decoded here; revocations are checked by the route
+    for name, value in scope["headers"]:
+        if name == b"authorization":
+            scheme, _, token = value.decode("latin-1").partition(" ")
+            if scheme.lower() == "bearer":
+                user_id = decode_token_user_id(token)
+                if user_id:
+                    return f"user:{user_id}"
+            break
+    client = scope.get("client")
+    return f"ip:{client[0] if client else 'unknown'}"
+
+
+class RateLimitMiddleware:
+    """
+    Admission control for the routes in RATE_LIMITS. A request is shed with
+    503 while this worker already handles ADMISSION_MAX_IN_FLIGHT of them or
+    recent pool checkouts waited longer than ADMISSION_MAX_POOL_WAIT, and
+    rejected with 429 once its client's token bucket for the route is empty.
+    """
+
+    def __init__(self, app, limiter=None) -> None:
+        self.app = app
+        self.limiter = limiter or rate_limiter
+        self.in_flight = 0
+
+    async def admit(self, scope, route: str, policy: Tuple[float, int]) -> None:
+        if (
+            self.in_flight >= settings.ADMISSION_MAX_IN_FLIGHT
+            or engine.pool.recent_wait_time() > settings.ADMISSION_MAX_POOL_WAIT
+        ):
+            raise RequestError(
+                err_msg="Server is busy, please try again later",
+                status_code=503,
+                headers={"Retry-After": "1"},
+            )
+        rate, burst = policy
+        wait = await self.limiter.acquire(f"{route}:{client_key(scope)}", rate, burst)
+        if wait:
+            raise RequestError(
+                err_msg="Too many requests, please try again later",
+                status_code=429,
+                headers={"Retry-After": str(math.ceil(wait))},
+            )
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not settings.RATE_LIMIT_ENABLED:
+            return await self.app(scope, receive, send)
+        route = f"{scope['method']} {route_template(scope)}"
+        policy: Optional[Tuple[float, int]] = settings.RATE_LIMITS.get(route)
+        if not policy:
+            return await self.app(scope, receive, send)
+
+        try:
+            await self.admit(scope, route, policy)
+        except RequestError as exc:
+            response = request_error_handler(None, exc)
+            return await response(scope, receive, send)
+
+        self.in_flight += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.in_flight -= 1
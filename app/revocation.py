@@ -0,0 +1,118 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, FrozenSet, Optional
+
+from sqlalchemy import delete, event, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.conf import settings
+from app.database import SessionLocal
+from app.models import RevokedToken, User
+
+logger = logging.getLogger(__name__)
+
+# Tokens expire after this long, so older revocations no longer matter
+TOKEN_LIFETIME = timedelta(hours=100)
+
+
+class RevocationList:
+    """
+    In-memory copy of the revoked_tokens table: revoked token ids, and for
+    revoked users the time before which their tokens are no longer valid.
+    Swapped wholesale on refresh, so checks never wait on the database.
+    """
+
+    def __init__(
+        self, session_factory: async_sessionmaker, refresh_interval: float
+    ) -> None:
+        self.session_factory = session_factory
+        self.refresh_interval = refresh_interval
+        self.jtis: FrozenSet[str] = frozenset()
+        self.users: Dict[uuid.UUID, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def is_revoked(self, jti: Optional[str], user_id: uuid.UUID, iat: float) -> bool:
+        if jti and jti in self.jtis:
+            return True
+        revoked_at = self.users.get(user_id)
+        return revoked_at is not None and iat <= revoked_at
+
+    def add(self, jti: Optional[str], user_id: Optional[uuid.UUID], at: datetime):
+        # Applies a revocation made by this worker without waiting for a refresh
+        if jti:
+            self.jtis = self.jtis | {jti}
+        if user_id:
+            self.users = {**self.users, user_id: at.timestamp()}
+
+    async def refresh(self) -> None:
+        since = datetime.now() - TOKEN_LIFETIME
+        async with self.session_factory() as db:
+            rows = (
+                await db.execute(
+                    select(
+                        RevokedToken.jti, RevokedToken.user_id, RevokedToken.created_at
+                    ).where(RevokedToken.created_at >= since)
+                )
+            ).all()
+        users = {}
+        for _, user_id, created_at in rows:
+            if user_id:
+                users[user_id] = max(users.get(user_id, 0), created_at.timestamp())
+        self.jtis = frozenset(jti for jti, _, _ in rows if jti)
+        self.users = users
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Failed to refresh revoked tokens")
+            await asyncio.sleep(self.refresh_interval)
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+revocations = RevocationList(SessionLocal, settings.AUTH_REVOCATION_REFRESH_INTERVAL)
+
+
+async def revoke(
+    db: AsyncSession,
+    jti: Optional[str] = None,
+    user_id: Optional[uuid.UUID] = None,
+) -> None:
+    # Revokes one token, or every token issued to a user so far. Other workers
+    # pick it up within AUTH_REVOCATION_REFRESH_INTERVAL
+    now = datetime.now()
+    db.add(RevokedToken(jti=jti, user_id=user_id, created_at=now, updated_at=now))
+    # Expired tokens are rejected anyway, so their revocations can go
+    await db.execute(
+        delete(RevokedToken).where(RevokedToken.created_at < now - TOKEN_LIFETIME)
+    )
+    await db.commit()
+    revocations.add(jti, user_id, now)
+
+
+@event.listens_for(User, "after_delete")
+def revoke_deleted_user(mapper, connection, target: User) -> None:
+    # Stateless tokens carry the user's claims, so deleting the user must
+    # revoke them explicitly
+    now = datetime.now()
+    connection.execute(
+        insert(RevokedToken).values(
+            id=uuid.uuid4(), user_id=target.id, created_at=now, updated_at=now
+        )
+    )
+    revocations.add(None, target.id, now)
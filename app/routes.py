@@ -1,23 +1,139 @@
-from fastapi import APIRouter, Depends
-from sqlalchemy import select
+import asyncio
+from typing import Awaitable, Callable, Iterable, Optional, Tuple
+from uuid import UUID
+from fastapi import APIRouter, Depends, Request, Response
+from fastapi.responses import StreamingResponse
+import orjson
 
-from app.database import get_db
-from app.deps import get_user
+from app.cache import response_cache
+from app.conf import settings
+from app.database import get_db, is_replica
+from app.deps import get_optional_user_id, get_read_db, get_user
 from app.handlers import RequestError
-from app.models import Article, Like, User
+from app.like_buffer import like_buffer, write_likes
+from app.live_likes import like_count_listener
+from app.tasks import task_queue
+from app.trending import TRENDING_CACHE_TAG, TRENDING_WINDOWS, window_start
+from app.queries import (
+    article_detail_query,
+    article_ids_query,
+    articles_page_query,
+    liked_slugs_query,
+    likes_counts_query,
+    login_user_query,
+    search_articles_query,
+    trending_articles_query,
+    toggle_like_query,
+)
+from app.serializers import article_data, render_response
 from app.schemas import (
+    LIKE_BATCH_MAX_OPERATIONS,
+    LIKE_STATUSES_MAX_SLUGS,
     ArticleResponseSchema,
     ArticlesResponseSchema,
+    LikeBatchRequestSchema,
+    LikeBatchResponseSchema,
+    LikeResponseSchema,
+    LikeStatusesRequestSchema,
+    LikeStatusesResponseSchema,
     LoginSchema,
     ResponseSchema,
     TokenResponseSchema,
+    TrendingArticlesResponseSchema,
 )
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.utils import create_auth_token, verify_password
+from app.utils import (
+    AuthUser,
+    create_auth_token,
+    decode_cursor,
+    decode_search_cursor,
+    encode_cursor,
+    encode_search_cursor,
+    etag_matches,
+    make_etag,
+    mark_recent_write,
+    verify_password_async,
+)
 
 router = APIRouter()
 
+ARTICLES_DEFAULT_LIMIT = 20
+ARTICLES_MAX_LIMIT = 100
+LIVE_LIKES_MAX_SLUGS = 100
+LIKE_BATCH_ACTIONS = {"like": True, "unlike": False}
+
+
+async def cached_response(
+    request: Request,
+    db: AsyncSession,
+    key: str,
+    build: Callable[[], Awaitable[Tuple[bytes, Iterable[str]]]],
+    personalize: Optional[Callable[[bytes], Awaitable[bytes]]] = None,
+) -> Response:
+    # Serves the serialized payload from the response cache, building and caching
+    # it on a miss. `build` returns the response body and its invalidation tags,
+    # `personalize` adjusts the shared body for the current caller
+    body = await response_cache.get(key)
+    if body is None:
+        # Taken before reading, so the body isn't stored if one of its tags is
+        # invalidated while it's being built
+        generation = await response_cache.generation()
+        body, tags = await build()
+        # A replica may still miss a write whose invalidation caused this miss,
+        # so its bodies are only kept for as long as it's allowed to lag
+        ttl = settings.REPLICA_MAX_LAG if is_replica(db) else None
+        await response_cache.set(key, body, tags, ttl, generation)
+    if personalize:
+        body = await personalize(body)
+
+    headers = {"ETag": make_etag(body), "Vary": "Authorization"}
+    if etag_matches(headers["ETag"], request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
+async def get_liked_slugs(db: AsyncSession, user_id: UUID, slugs: Iterable[str]) -> set:
+    slugs = list(slugs)
+    if not slugs:
+        return set()
+    return set((await db.execute(liked_slugs_query(user_id, slugs))).scalars().all())
+
+
+def liked_by_me(
+    db: AsyncSession, user_id: Optional[UUID]
+) -> Optional[Callable[[bytes], Awaitable[bytes]]]:
+    # Sets liked_by_me on every article of a cached payload with one query
+    if not user_id:
+        return None
+
+    async def personalize(body: bytes) -> bytes:
+        payload = orjson.loads(body)
+        data = payload["data"]
+        articles = data if isinstance(data, list) else [data]
+        liked = await get_liked_slugs(
+            db, user_id, [article["slug"] for article in articles]
+        )
+        for article in articles:
+            article["liked_by_me"] = article["slug"] in liked
+        return orjson.dumps(payload)
+
+    return personalize
+
+
+async def commit_likes(db: AsyncSession, slugs: Iterable[str]) -> None:
+    # Commits a like write and invalidates the cached payloads of its articles.
+    # A shared cache is invalidated by a task queued in the same transaction, so
+    # the request doesn't wait for it and a crash can't lose it. A per-worker
+    # cache belongs to this worker, so it is invalidated right after the commit
+    tags = [f"article:{slug}" for slug in slugs]
+    if tags and response_cache.shared:
+        await task_queue.enqueue("invalidate_cache_tags", db=db, tags=tags)
+    await db.commit()
+    if not response_cache.shared:
+        for tag in tags:
+            await response_cache.invalidate_tag(tag)
+
 
 @router.post(
     "/auth/login",
@@ -39,14 +155,12 @@ async def login(
 ) -> TokenResponseSchema:
     email = data.email
     plain_password = data.password
-    user = (
-        await db.execute(select(User).where(User.email == email))
-    ).scalar_one_or_none()
-    if not user or verify_password(plain_password, user.password) == False:
+    user = (await db.execute(login_user_query(email))).one_or_none()
+    if not user or not await verify_password_async(plain_password, user.password):
         raise RequestError(err_msg="Invalid credentials", status_code=401)
 
     # Create auth token
-    token = create_auth_token(user.id)
+    token = create_auth_token(user.id, user.name, user.email)
     return {
         "message": "Login successful",
         "data": {"token": token},
@@ -62,18 +176,140 @@ article_tags = (["Articles"],)
     summary="View all articles",
     description="""
         ****
-        This endpoint allows people to view all existing articles
+        This endpoint allows people to view all existing articles, newest first.
+        Results are paginated: pass the returned `next_cursor` as `cursor` to fetch the next page.
+        `limit` is capped at 100.
     """,
     status_code=200,
 )
 async def articles_view(
-    db: AsyncSession = Depends(get_db),
+    request: Request,
+    cursor: Optional[str] = None,
+    limit: int = ARTICLES_DEFAULT_LIMIT,
+    user_id: Optional[UUID] = Depends(get_optional_user_id),
+    db: AsyncSession = Depends(get_read_db),
 ) -> ArticlesResponseSchema:
-    articles = (await db.execute(select(Article))).unique().scalars().all()
-    return {
-        "message": "Articles fetched successfully",
-        "data": articles,
-    }
+    limit = max(1, min(limit, ARTICLES_MAX_LIMIT))
+    position = None
+    if cursor:
+        position = decode_cursor(cursor)
+        if not position:
+            raise RequestError(err_msg="Invalid cursor", status_code=400)
+
+    async def build():
+        # Fetch one extra row to know whether another page exists
+        articles = (await db.execute(articles_page_query(position, limit + 1))).all()
+        next_cursor = None
+        if len(articles) > limit:
+            articles = articles[:limit]
+            next_cursor = encode_cursor(articles[-1].created_at, articles[-1].id)
+        body = render_response(
+            ArticlesResponseSchema,
+            {
+                "message": "Articles fetched successfully",
+                "data": [article_data(article) for article in articles],
+                "next_cursor": next_cursor,
+            },
+        )
+        return body, [f"article:{article.slug}" for article in articles]
+
+    return await cached_response(
+        request, db, f"articles:{cursor}:{limit}", build, liked_by_me(db, user_id)
+    )
+
+
+@router.get(
+    "/articles/search",
+    tags=article_tags,
+    summary="Search articles",
+    description="""
+        ****
+        This endpoint searches article titles and descriptions, best match first.
+        `q` supports quoted phrases, `OR` and `-word`. Set `boost_likes` to favour popular articles.
+        Results are paginated like the articles list: pass the returned `next_cursor` as `cursor`.
+    """,
+    status_code=200,
+)
+async def search_articles_view(
+    request: Request,
+    q: str = "",
+    boost_likes: bool = False,
+    cursor: Optional[str] = None,
+    limit: int = ARTICLES_DEFAULT_LIMIT,
+    user_id: Optional[UUID] = Depends(get_optional_user_id),
+    db: AsyncSession = Depends(get_read_db),
+) -> ArticlesResponseSchema:
+    q = q.strip()
+    if not q:
+        raise RequestError(err_msg="Search query is required", status_code=400)
+    limit = max(1, min(limit, ARTICLES_MAX_LIMIT))
+    position = None
+    if cursor:
+        position = decode_search_cursor(cursor)
+        if not position:
+            raise RequestError(err_msg="Invalid cursor", status_code=400)
+
+    async def build():
+        query = search_articles_query(q, boost_likes, position, limit + 1)
+        articles = (await db.execute(query)).all()
+        next_cursor = None
+        if len(articles) > limit:
+            articles = articles[:limit]
+            next_cursor = encode_search_cursor(articles[-1].rank, articles[-1].id)
+        body = render_response(
+            ArticlesResponseSchema,
+            {
+                "message": "Articles fetched successfully",
+                "data": [article_data(article) for article in articles],
+                "next_cursor": next_cursor,
+            },
+        )
+        return body, [f"article:{article.slug}" for article in articles]
+
+    key = f"search:{q}:{boost_likes}:{cursor}:{limit}"
+    return await cached_response(request, db, key, build, liked_by_me(db, user_id))
+
+
+@router.get(
+    "/articles/trending",
+    tags=article_tags,
+    summary="View trending articles",
+    description="""
+        ****
+        This endpoint returns the most liked articles of the last 24 hours (`window=24h`) or 7 days (`window=7d`).
+        Rankings are refreshed about once a minute. `limit` is capped at 100.
+    """,
+    status_code=200,
+)
+async def trending_articles_view(
+    request: Request,
+    window: str = "24h",
+    limit: int = ARTICLES_DEFAULT_LIMIT,
+    user_id: Optional[UUID] = Depends(get_optional_user_id),
+    db: AsyncSession = Depends(get_read_db),
+) -> TrendingArticlesResponseSchema:
+    if window not in TRENDING_WINDOWS:
+        raise RequestError(err_msg="Window must be one of: 24h, 7d", status_code=400)
+    limit = max(1, min(limit, ARTICLES_MAX_LIMIT))
+
+    async def build():
+        query = trending_articles_query(window_start(window), limit)
+        articles = (await db.execute(query)).all()
+        body = render_response(
+            TrendingArticlesResponseSchema,
+            {
+                "message": "Trending articles fetched successfully",
+                "data": [
+                    {**article_data(article), "recent_likes": article.recent_likes}
+                    for article in articles
+                ],
+            },
+        )
+        tags = [f"article:{article.slug}" for article in articles]
+        return body, [TRENDING_CACHE_TAG, *tags]
+
+    key = f"trending:{window}:{limit}"
+    return await cached_response(request, db, key, build, liked_by_me(db, user_id))
 
 
 @router.get(
@@ -87,20 +323,116 @@ async def articles_view(
     status_code=200,
 )
 async def single_article_view(
+    request: Request,
     slug: str,
-    db: AsyncSession = Depends(get_db),
+    user_id: Optional[UUID] = Depends(get_optional_user_id),
+    db: AsyncSession = Depends(get_read_db),
 ) -> ArticleResponseSchema:
-    article = (
-        (await db.execute(select(Article).where(Article.slug == slug)))
-        .unique()
-        .scalar_one_or_none()
+    async def build():
+        article = (await db.execute(article_detail_query(slug))).one_or_none()
+        if not article:
+            raise RequestError(err_msg="Article does not exist!", status_code=404)
+        body = render_response(
+            ArticleResponseSchema,
+            {
+                "message": "Article details fetched successfully",
+                "data": article_data(article),
+            },
+        )
+        return body, [f"article:{slug}"]
+
+    return await cached_response(
+        request, db, f"article:{slug}", build, liked_by_me(db, user_id)
+    )
+
+
+def sse_event(event: str, data: dict) -> bytes:
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+
+
+@router.get(
+    "/articles/likes/stream",
+    tags=article_tags,
+    summary="Stream live like counts",
+    description="""
+        ****
+        This endpoint streams server-sent `likes` events mapping slugs to their current likes_count, for up to 100 comma separated slugs.
+        The first event holds the current counts of the existing slugs. After that, an event is sent whenever counts change,
+        at most once a second, with rapid changes merged into the latest count.
+        Use it instead of polling the article endpoint.
+    """,
+    response_class=StreamingResponse,
+)
+async def likes_stream_view(
+    slugs: str = "",
+    db: AsyncSession = Depends(get_read_db),
+) -> StreamingResponse:
+    slugs = list(dict.fromkeys(filter(None, slugs.split(","))))
+    if not slugs:
+        raise RequestError(err_msg="Provide at least one slug", status_code=422)
+    if len(slugs) > LIVE_LIKES_MAX_SLUGS:
+        raise RequestError(
+            err_msg=f"At most {LIVE_LIKES_MAX_SLUGS} slugs are allowed",
+            status_code=422,
+        )
+    # Subscribe before reading the counts so that no change falls in between
+    subscription = like_count_listener.subscribe(slugs)
+    try:
+        counts = dict((await db.execute(likes_counts_query(slugs))).all())
+    except BaseException:
+        like_count_listener.unsubscribe(subscription)
+        raise
+
+    async def events():
+        # Runs after the request's session is closed, so streams hold no connection
+        try:
+            yield sse_event("likes", counts)
+            while True:
+                try:
+                    changed = await asyncio.wait_for(
+                        subscription.get(), settings.LIVE_LIKES_KEEPALIVE
+                    )
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                yield sse_event("likes", changed)
+                await asyncio.sleep(settings.LIVE_LIKES_INTERVAL)
+        finally:
+            like_count_listener.unsubscribe(subscription)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
-    if not article:
-        raise RequestError(err_msg="Article does not exist!", status_code=404)
 
+
+@router.post(
+    "/articles/likes/status",
+    tags=article_tags,
+    summary="Check like status of many articles",
+    description="""
+        ****
+        This endpoint returns whether the authenticated user liked each of the given articles (up to 100 slugs)
+        Unknown slugs are reported as not liked.
+    """,
+    status_code=200,
+)
+async def like_statuses_view(
+    data: LikeStatusesRequestSchema,
+    user: AuthUser = Depends(get_user),
+    db: AsyncSession = Depends(get_read_db),
+) -> LikeStatusesResponseSchema:
+    slugs = list(dict.fromkeys(data.slugs))
+    if len(slugs) > LIKE_STATUSES_MAX_SLUGS:
+        raise RequestError(
+            err_msg=f"At most {LIKE_STATUSES_MAX_SLUGS} slugs are allowed",
+            status_code=422,
+        )
+    liked = await get_liked_slugs(db, user.id, slugs)
     return {
-        "message": "Article details fetched successfully",
-        "data": article,
+        "message": "Like statuses fetched successfully",
+        "data": [{"slug": slug, "liked": slug in liked} for slug in slugs],
     }
 
 
@@ -117,30 +449,111 @@ async def single_article_view(
 )
 async def like_article(
     slug: str,
-    user: User = Depends(get_user),
+    response: Response,
+    user: AuthUser = Depends(get_user),
     db: AsyncSession = Depends(get_db),
-) -> ResponseSchema:
-    article = (
-        (await db.execute(select(Article).where(Article.slug == slug)))
-        .unique()
-        .scalar_one_or_none()
-    )
-    if not article:
-        raise RequestError(err_msg="Article does not exist!", status_code=404)
-
-    message_substring = "added"
-    # If an item with the same user and article id exists, we'll delete, otherwise we'll create
-    like_obj = (
-        await db.execute(
-            select(Like).where(Like.article_id == article.id, Like.user_id == user.id)
-        )
-    ).scalar_one_or_none()
-    if like_obj:
-        message_substring = "removed"
-        await db.delete(like_obj)
-        await db.commit()
+) -> LikeResponseSchema:
+    if settings.LIKE_WRITE_BEHIND and like_buffer.accepting:
+        # Buffered and written by the flusher, which also invalidates the cache
+        result = await like_buffer.toggle(db, slug, user.id)
+        if not result:
+            raise RequestError(err_msg="Article does not exist!", status_code=404)
     else:
-        obj_to_create = Like(user_id=user.id, article_id=article.id)
-        db.add(obj_to_create)
-        await db.commit()
-    return {"message": f"Like {message_substring} successfully"}
+        if settings.LIKE_WRITE_BEHIND:
+            # The buffer can't flush, so don't acknowledge a toggle it may drop
+            result = await like_buffer.write_through(db, slug, user.id)
+        else:
+            # If an item with the same user and article id exists, we'll delete, otherwise we'll create
+            query = toggle_like_query(slug, user.id)
+            result = (await db.execute(query)).one_or_none()
+        if not result:
+            raise RequestError(err_msg="Article does not exist!", status_code=404)
+        await commit_likes(db, [slug])
+    mark_recent_write(user.id, response)
+
+    liked, likes_count = result
+    message_substring = "added" if liked else "removed"
+    return {
+        "message": f"Like {message_substring} successfully",
+        "data": {"liked": liked, "likes_count": likes_count},
+    }
+
+
+@router.post(
+    "/likes/batch",
+    tags=article_tags,
+    summary="Like or unlike many articles",
+    description="""
+        ****
+        This endpoint applies up to 500 `like`/`unlike` operations for the authenticated user at once.
+        Operations set the like state rather than toggling it, so replaying a batch is safe.
+        When a slug appears more than once, its last operation wins.
+        Every operation gets a result. `error` is set for unknown articles or actions.
+    """,
+    status_code=200,
+)
+async def like_batch_view(
+    data: LikeBatchRequestSchema,
+    response: Response,
+    user: AuthUser = Depends(get_user),
+    db: AsyncSession = Depends(get_db),
+) -> LikeBatchResponseSchema:
+    operations = data.operations
+    if len(operations) > LIKE_BATCH_MAX_OPERATIONS:
+        raise RequestError(
+            err_msg=f"At most {LIKE_BATCH_MAX_OPERATIONS} operations are allowed",
+            status_code=422,
+        )
+
+    # Final state per slug, in request order
+    states = {
+        op.slug: LIKE_BATCH_ACTIONS[op.action]
+        for op in operations
+        if op.action in LIKE_BATCH_ACTIONS
+    }
+    article_ids = {}
+    if states:
+        article_ids = dict((await db.execute(article_ids_query(states))).all())
+    states = {slug: liked for slug, liked in states.items() if slug in article_ids}
+
+    changed = set()
+    if states and settings.LIKE_WRITE_BEHIND and like_buffer.accepting:
+        slugs = {article_id: slug for slug, article_id in article_ids.items()}
+        changed_ids = await like_buffer.set_states(
+            db, user.id, {article_ids[slug]: state for slug, state in states.items()}
+        )
+        changed = {slugs[article_id] for article_id in changed_ids}
+    elif states and settings.LIKE_WRITE_BEHIND:
+        # The buffer can't flush, so don't acknowledge states it may drop
+        changed = set(
+            await like_buffer.write_states(
+                db,
+                user.id,
+                {article_ids[slug]: state for slug, state in states.items()},
+            )
+        )
+        await commit_likes(db, changed)
+    elif states:
+        # Set-based statements in one transaction
+        changed = set(
+            await write_likes(
+                db,
+                {(user.id, article_ids[slug]): state for slug, state in states.items()},
+            )
+        )
+        await commit_likes(db, changed)
+    if changed:
+        mark_recent_write(user.id, response)
+
+    results = []
+    for op in operations:
+        result = {"slug": op.slug, "action": op.action}
+        if op.action not in LIKE_BATCH_ACTIONS:
+            result["error"] = "Invalid action"
+        elif op.slug not in article_ids:
+            result["error"] = "Article does not exist!"
+        else:
+            result["liked"] = states[op.slug]
+            result["changed"] = op.slug in changed
+        results.append(result)
+    return {"message": "Likes updated successfully", "data": results}
@@ -1,7 +1,10 @@
 from datetime import datetime
-from typing import List
+from typing import Dict, List, Optional
 from pydantic import BaseModel, EmailStr, Field
 
+LIKE_STATUSES_MAX_SLUGS = 100
+LIKE_BATCH_MAX_OPERATIONS = 500
+
 
 class LoginSchema(BaseModel):
     email: EmailStr = Field(..., example="johndoe@example.com")
@@ -31,11 +34,94 @@ class ArticleSchema(BaseModel):
     likes_count: int
     created_at: datetime
     updated_at: datetime
+    # Always false for anonymous requests
+    liked_by_me: bool = False
 
 
 class ArticlesResponseSchema(ResponseSchema):
     data: List[ArticleSchema]
+    next_cursor: Optional[str] = None
+
+
+class TrendingArticleSchema(ArticleSchema):
+    recent_likes: int
+
+
+class TrendingArticlesResponseSchema(ResponseSchema):
+    data: List[TrendingArticleSchema]
 
 
 class ArticleResponseSchema(ResponseSchema):
     data: ArticleSchema
+
+
+class LikeStatusSchema(BaseModel):
+    liked: bool
+    likes_count: int
+
+
+class LikeResponseSchema(ResponseSchema):
+    data: LikeStatusSchema
+
+
+class LikeStatusesRequestSchema(BaseModel):
+    slugs: List[str] = Field(
+        ..., max_length=LIKE_STATUSES_MAX_SLUGS, example=["my-article", "cool-article"]
+    )
+
+
+class ArticleLikeStatusSchema(BaseModel):
+    slug: str
+    liked: bool
+
+
+class LikeStatusesResponseSchema(ResponseSchema):
+    data: List[ArticleLikeStatusSchema]
+
+
+class LikeBatchOperationSchema(BaseModel):
+    slug: str = Field(..., example="my-article")
+    action: str = Field(..., example="like")  # "like" or "unlike"
+
+
+class LikeBatchRequestSchema(BaseModel):
+    operations: List[LikeBatchOperationSchema] = Field(
+        ..., max_length=LIKE_BATCH_MAX_OPERATIONS
+    )
+
+
+class LikeBatchResultSchema(BaseModel):
+    slug: str
+    action: str
+    liked: Optional[bool] = None
+    changed: bool = False
+    error: Optional[str] = None
+
+
+class LikeBatchResponseSchema(ResponseSchema):
+    data: List[LikeBatchResultSchema]
+
+
+class CacheStatsSchema(BaseModel):
+    size: int
+    maxsize: int
+    hits: int
+    misses: int
+
+
+class CacheStatsResponseSchema(ResponseSchema):
+    data: Dict[str, CacheStatsSchema]
+
+
+class PoolStatsSchema(BaseModel):
+    size: int
+    checked_in: int
+    checked_out: int
+    overflow: int
+    wait_count: int
+    wait_time_total: float
+    wait_time_max: float
+
+
+class PoolStatsResponseSchema(ResponseSchema):
+    data: Dict[str, PoolStatsSchema]
@@ -0,0 +1,182 @@
+import logging
+import math
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Iterator, List, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.models import check_slug
+from app.utils import get_password_hash
+
+logger = logging.getLogger(__name__)
+
+SEED_NAMESPACE = uuid.UUID("6f1d3b7e-52c4-4c8e-9a0b-5f2e7d9c1a44")
+# Every synthetic user shares this password, hashed once per run
+SEED_PASSWORD = "password"
+# Fixed origin so that generated timestamps are reproducible
+SEED_EPOCH = datetime(2024, 1, 1)
+
+USER_COLUMNS = ("id", "name", "email", "password", "created_at", "updated_at")
+ARTICLE_COLUMNS = ("id", "title", "slug", "desc", "created_at", "updated_at")
+LIKE_COLUMNS = ("id", "user_id", "article_id", "created_at", "updated_at")
+
+UPDATE_LIKES_COUNT = """
+    UPDATE articles
+    SET likes_count = counts.total
+    FROM (SELECT article_id, COUNT(*) AS total FROM likes GROUP BY article_id) AS counts
+    WHERE counts.article_id = articles.id AND articles.likes_count != counts.total
+"""
+
+
+def seeded_id(seed: int, kind: str, index: int) -> uuid.UUID:
+    return uuid.uuid5(SEED_NAMESPACE, f"{seed}:{kind}:{index}")
+
+
+def user_rows(seed: int, start: int, stop: int, password: str) -> Iterator[Tuple]:
+    for i in range(start, stop):
+        created_at = SEED_EPOCH + timedelta(seconds=i)
+        yield (
+            seeded_id(seed, "user", i),
+            f"Seed User {i}",
+            f"user{i}.{seed}@seed.example.com",
+            password,
+            created_at,
+            created_at,
+        )
+
+
+def article_rows(seed: int, start: int, stop: int) -> Iterator[Tuple]:
+    for i in range(start, stop):
+        created_at = SEED_EPOCH + timedelta(seconds=i)
+        yield (
+            seeded_id(seed, "article", i),
+            f"Seed article {i}",
+            check_slug(f"seed-{seed}-article-{i}"),
+            f"Synthetic article number {i} generated with seed {seed}",
+            created_at,
+            created_at,
+        )
+
+
+def like_step(users: int, articles: int, seed: int) -> int:
+    # A stride coprime with users * articles walks every (user, article) pair
+    # exactly once, so likes are unique without tracking which pairs were used
+    space = users * articles
+    step = (seed * 2654435761 + 1) % space or 1
+    while math.gcd(step, space) != 1:
+        step += 1
+    return step
+
+
+def like_rows(
+    seed: int, start: int, stop: int, users: int, articles: int
+) -> Iterator[Tuple]:
+    space = users * articles
+    step = like_step(users, articles, seed)
+    for i in range(start, stop):
+        pair = i * step % space
+        created_at = SEED_EPOCH + timedelta(seconds=i)
+        yield (
+            seeded_id(seed, "like", i),
+            seeded_id(seed, "user", pair // articles),
+            seeded_id(seed, "article", pair % articles),
+            created_at,
+            created_at,
+        )
+
+
+async def copy_batches(
+    engine: AsyncEngine,
+    run_key: str,
+    table: str,
+    columns: Tuple[str, ...],
+    total: int,
+    batch_size: int,
+    rows_for_batch,
+) -> None:
+    batches = math.ceil(total / batch_size)
+    async with engine.connect() as conn:
+        pg = (await conn.get_raw_connection()).driver_connection
+        # seed_progress is created by the migrations
+        async with pg.transaction():
+            cursor = await pg.execute(
+                "SELECT batches_done FROM seed_progress WHERE run_key = %s AND kind = %s",
+                (run_key, table),
+            )
+            row = await cursor.fetchone()
+        done = row[0] if row else 0
+        if done:
+            logger.info(f"Resuming {table} at batch {done + 1}/{batches}")
+
+        column_list = ", ".join(f'"{column}"' for column in columns)
+        started = time.perf_counter()
+        for batch in range(done, batches):
+            start, stop = batch * batch_size, min((batch + 1) * batch_size, total)
+            # The batch and its progress marker commit together, so an
+            # interrupted run resumes from the first unfinished batch
+            async with pg.transaction():
+                async with pg.cursor().copy(
+                    f"COPY {table} ({column_list}) FROM STDIN"
+                ) as copy:
+                    for row in rows_for_batch(start, stop):
+                        await copy.write_row(row)
+                await pg.execute(
+                    "INSERT INTO seed_progress (run_key, kind, batches_done) "
+                    "VALUES (%s, %s, %s) ON CONFLICT (run_key, kind) "
+                    "DO UPDATE SET batches_done = EXCLUDED.batches_done",
+                    (run_key, table, batch + 1),
+                )
+            rate = (stop - done * batch_size) / (time.perf_counter() - started)
+            logger.info(
+                f"{table}: {stop}/{total} rows ({stop * 100 // total}%) "
+                f"at {rate:,.0f} rows/s"
+            )
+
+
+async def seed_database(
+    engine: AsyncEngine,
+    users: int,
+    articles: int,
+    likes: int,
+    seed: int = 42,
+    batch_size: int = 10000,
+) -> None:
+    """
+    Streams deterministic synthetic users, articles and likes into the database
+    with COPY. Rerunning with the same arguments resumes an interrupted run.
+    """
+    likes = min(likes, users * articles)
+    run_key = f"{seed}:{users}:{articles}:{likes}:{batch_size}"
+    password = get_password_hash(SEED_PASSWORD)
+
+    plan: List[Tuple] = [
+        (
+            "users",
+            USER_COLUMNS,
+            users,
+            lambda start, stop: user_rows(seed, start, stop, password),
+        ),
+        (
+            "articles",
+            ARTICLE_COLUMNS,
+            articles,
+            lambda start, stop: article_rows(seed, start, stop),
+        ),
+        (
+            "likes",
+            LIKE_COLUMNS,
+            likes,
+            lambda start, stop: like_rows(seed, start, stop, users, articles),
+        ),
+    ]
+    for table, columns, total, rows_for_batch in plan:
+        if total:
+            await copy_batches(
+                engine, run_key, table, columns, total, batch_size, rows_for_batch
+            )
+
+    # Likes are copied directly, so set the counters in one set-based pass
+    async with engine.begin() as conn:
+        await conn.exec_driver_sql(UPDATE_LIKES_COUNT)
@@ -0,0 +1,22 @@
+from typing import Any, Type
+
+import orjson
+from pydantic import BaseModel
+from sqlalchemy import Row
+
+from app.conf import settings
+from app.queries import ARTICLE_FIELDS
+
+
+def article_data(row: Row) -> dict:
+    # Extra trailing columns (such as the cursor id) are left out. Payloads are
+    # shared by all callers, so liked_by_me is filled in per request afterwards
+    return {**dict(zip(ARTICLE_FIELDS, row)), "liked_by_me": False}
+
+
+def render_response(schema: Type[BaseModel], payload: dict[str, Any]) -> bytes:
+    # Fast path: payloads are already plain data, so skip validation and encode
+    # straight to JSON bytes with orjson
+    if settings.FAST_JSON:
+        return orjson.dumps({"status": "success", **payload})
+    return schema.model_validate(payload).model_dump_json().encode()
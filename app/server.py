@@ -0,0 +1,39 @@
+"""
+Production entry point: python -m app.server
+
+Runs WEB_CONCURRENCY uvicorn worker processes (the CPU count by default) on
+uvloop and httptools, sharing one listening socket. Send SIGHUP to the main
+process to restart the workers one at a time, e.g. to pick up a new release;
+each stopping worker finishes its in-flight requests and runs the lifespan
+shutdown before it is replaced. SIGTTIN/SIGTTOU add or remove a worker.
+"""
+
+import os
+
+import uvicorn
+
+from app.conf import Settings, settings, worker_count
+
+
+def main() -> None:
+    workers = worker_count()
+    # Workers are spawned and read their settings from the environment, so
+    # they size their connection pools for the same number of workers
+    os.environ["WEB_CONCURRENCY"] = str(workers)
+    # Fail here rather than in every worker if the settings don't allow them
+    Settings()
+    uvicorn.run(
+        "app.main:app",
+        host=settings.HOST,
+        port=settings.PORT,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        proxy_headers=True,
+        forwarded_allow_ips=settings.FORWARDED_ALLOW_IPS,
+        timeout_graceful_shutdown=settings.GRACEFUL_SHUTDOWN_TIMEOUT,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,347 @@
+import asyncio
+from abc import ABC, abstractmethod
+import logging
+import uuid
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from sqlalchemy import delete, event, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session
+
+from app.cache import response_cache
+from app.conf import settings
+from app.database import SessionLocal
+from app.models import BackgroundTask
+
+logger = logging.getLogger(__name__)
+
+TaskHandler = Callable[..., Awaitable[None]]
+
+# Handlers by task name. Payloads are passed as keyword arguments and must be
+# JSON serializable, since the postgres backend stores them
+task_handlers: Dict[str, TaskHandler] = {}
+
+# Session.info key of the tasks queued in a session's open transaction
+PENDING_TASKS = "pending_tasks"
+
+
+def task_handler(name: str) -> Callable[[TaskHandler], TaskHandler]:
+    def register(handler: TaskHandler) -> TaskHandler:
+        task_handlers[name] = handler
+        return handler
+
+    return register
+
+
+class TaskQueue(ABC):
+    """Runs registered handlers with bounded concurrency and retries"""
+
+    def __init__(
+        self, concurrency: int, max_attempts: int, retry_backoff: float
+    ) -> None:
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        self.completed = self.failed = 0
+
+    def defer(self, db: AsyncSession, name: str, payload: dict) -> None:
+        # Hands the task to committed() once db's transaction commits, or drops
+        # it on rollback
+        db.sync_session.info.setdefault(PENDING_TASKS, []).append((self, name, payload))
+
+    @abstractmethod
+    async def enqueue(
+        self, name: str, db: Optional[AsyncSession] = None, **payload
+    ) -> None:
+        # Queues a task. With db, it only runs if db's transaction commits
+        ...
+
+    @abstractmethod
+    def committed(self, name: str, payload: dict) -> None:
+        # Called for each deferred task once its transaction has committed
+        ...
+
+    @abstractmethod
+    def start(self) -> None: ...
+
+    @abstractmethod
+    async def stop(self, timeout: float) -> None:
+        # Stops running tasks, giving unfinished ones up to `timeout` seconds
+        ...
+
+    def retry_delay(self, attempts: int) -> float:
+        return self.retry_backoff * 2 ** (attempts - 1)
+
+    async def run(self, name: str, payload: dict, attempts: int) -> bool:
+        # Returns whether the task succeeded. Failures are logged, never raised
+        try:
+            handler = task_handlers[name]
+            await handler(**payload)
+        except Exception:
+            self.failed += 1
+            logger.exception(
+                f"Task {name} failed (attempt {attempts}/{self.max_attempts})"
+            )
+            if attempts >= self.max_attempts:
+                logger.error(f"Giving up on task {name}: {payload}")
+            return False
+        self.completed += 1
+        return True
+
+
+class MemoryTaskQueue(TaskQueue):
+    """
+    Per-worker queue. Tasks run after the response is sent, in the worker that
+    queued them; tasks still queued when the process dies are lost. Before the
+    queue is started (tests, commands), tasks run inline instead.
+    """
+
+    def __init__(
+        self, concurrency: int, max_attempts: int, retry_backoff: float
+    ) -> None:
+        super().__init__(concurrency, max_attempts, retry_backoff)
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._workers: List[asyncio.Task] = []
+        self._retries: Set[asyncio.Task] = set()
+        self._inline: Set[asyncio.Task] = set()
+
+    def __len__(self):
+        return self._queue.qsize() + len(self._retries)
+
+    async def enqueue(
+        self, name: str, db: Optional[AsyncSession] = None, **payload
+    ) -> None:
+        # With db, the task is queued once db's transaction commits
+        if db is not None:
+            self.defer(db, name, payload)
+        elif self._workers:
+            self._queue.put_nowait((name, payload, 1))
+        else:
+            await self.run(name, payload, self.max_attempts)
+
+    def committed(self, name: str, payload: dict) -> None:
+        if self._workers:
+            self._queue.put_nowait((name, payload, 1))
+            return
+        task = asyncio.create_task(self.run(name, payload, self.max_attempts))
+        self._inline.add(task)
+        task.add_done_callback(self._inline.discard)
+
+    async def _work(self) -> None:
+        while True:
+            name, payload, attempts = await self._queue.get()
+            try:
+                succeeded = await self.run(name, payload, attempts)
+                if not succeeded and attempts < self.max_attempts:
+                    retry = asyncio.create_task(self._retry(name, payload, attempts))
+                    self._retries.add(retry)
+                    retry.add_done_callback(self._retries.discard)
+            finally:
+                self._queue.task_done()
+
+    async def _retry(self, name: str, payload: dict, attempts: int) -> None:
+        await asyncio.sleep(self.retry_delay(attempts))
+        self._queue.put_nowait((name, payload, attempts + 1))
+
+    async def join(self) -> None:
+        # Waits until every queued task, including pending retries, is done
+        while True:
+            await self._queue.join()
+            if not self._retries:
+                return
+            await asyncio.wait(self._retries)
+
+    def start(self) -> None:
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._work()) for _ in range(self.concurrency)
+            ]
+
+    async def stop(self, timeout: float) -> None:
+        # Drains the queue for up to `timeout` seconds, then drops what's left
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {len(self)} background tasks on shutdown")
+        tasks = [*self._workers, *self._retries]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._workers = []
+
+
+class PostgresTaskQueue(TaskQueue):
+    """
+    Durable queue in the background_tasks table, run by every worker. Tasks are
+    claimed with FOR UPDATE SKIP LOCKED, so workers never wait on each other,
+    and leased for `lease_timeout` seconds: a task whose worker died before
+    finishing it is claimed again once its lease runs out.
+    """
+
+    def __init__(
+        self,
+        session_factory: async_sessionmaker,
+        concurrency: int,
+        max_attempts: int,
+        retry_backoff: float,
+        poll_interval: float,
+        lease_timeout: float,
+    ) -> None:
+        super().__init__(concurrency, max_attempts, retry_backoff)
+        self.session_factory = session_factory
+        self.poll_interval = poll_interval
+        self.lease_timeout = lease_timeout
+        self._running: Set[asyncio.Task] = set()
+        self._wake = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    async def enqueue(
+        self, name: str, db: Optional[AsyncSession] = None, **payload
+    ) -> None:
+        # With db, the task row is written in db's transaction, so it exists
+        # exactly when the caller's changes do
+        if db is not None:
+            db.add(BackgroundTask(name=name, payload=payload))
+            self.defer(db, name, payload)
+            return
+        async with self.session_factory() as db:
+            db.add(BackgroundTask(name=name, payload=payload))
+            await db.commit()
+        self._wake.set()
+
+    def committed(self, name: str, payload: dict) -> None:
+        # The row is already stored; this worker just needn't wait for a poll
+        self._wake.set()
+
+    async def claim(self, limit: int) -> List[Tuple[uuid.UUID, str, dict, int]]:
+        now = datetime.now()
+        claimable = (
+            select(BackgroundTask.id)
+            .where(BackgroundTask.run_at <= now)
+            .order_by(BackgroundTask.run_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        async with self.session_factory() as db:
+            rows = (
+                await db.execute(
+                    update(BackgroundTask)
+                    .where(BackgroundTask.id.in_(claimable))
+                    .values(
+                        run_at=now + timedelta(seconds=self.lease_timeout),
+                        attempts=BackgroundTask.attempts + 1,
+                    )
+                    .returning(
+                        BackgroundTask.id,
+                        BackgroundTask.name,
+                        BackgroundTask.payload,
+                        BackgroundTask.attempts,
+                    )
+                    .execution_options(synchronize_session=False)
+                )
+            ).all()
+            await db.commit()
+        return rows
+
+    async def execute(
+        self, task_id: uuid.UUID, name: str, payload: dict, attempts: int
+    ) -> None:
+        succeeded = await self.run(name, payload, attempts)
+        try:
+            async with self.session_factory() as db:
+                if succeeded or attempts >= self.max_attempts:
+                    query = delete(BackgroundTask)
+                else:
+                    run_at = datetime.now() + timedelta(
+                        seconds=self.retry_delay(attempts)
+                    )
+                    query = update(BackgroundTask).values(run_at=run_at)
+                await db.execute(query.where(BackgroundTask.id == task_id))
+                await db.commit()
+        except Exception:
+            # The task reruns once its lease runs out
+            logger.exception(f"Failed to record the outcome of task {name}")
+
+    async def _run(self) -> None:
+        while True:
+            free = self.concurrency - len(self._running)
+            claimed = []
+            if free:
+                try:
+                    claimed = await self.claim(free)
+                except Exception:
+                    logger.exception("Failed to claim background tasks")
+            for row in claimed:
+                task = asyncio.create_task(self.execute(*row))
+                self._running.add(task)
+                task.add_done_callback(self._running.discard)
+                task.add_done_callback(lambda _: self._wake.set())
+            if free and len(claimed) == free:
+                # There may be more waiting
+                continue
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float) -> None:
+        # Stops claiming and lets running tasks finish for up to `timeout`
+        # seconds. Unfinished ones rerun after their lease on another worker
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._running:
+            _, unfinished = await asyncio.wait(self._running, timeout=timeout)
+            for task in unfinished:
+                task.cancel()
+            await asyncio.gather(*unfinished, return_exceptions=True)
+
+
+def create_task_queue() -> Union[MemoryTaskQueue, PostgresTaskQueue]:
+    if settings.TASK_QUEUE_BACKEND == "postgres":
+        return PostgresTaskQueue(
+            SessionLocal,
+            concurrency=settings.TASK_CONCURRENCY,
+            max_attempts=settings.TASK_MAX_ATTEMPTS,
+            retry_backoff=settings.TASK_RETRY_BACKOFF,
+            poll_interval=settings.TASK_POLL_INTERVAL,
+            lease_timeout=settings.TASK_LEASE_TIMEOUT,
+        )
+    return MemoryTaskQueue(
+        concurrency=settings.TASK_CONCURRENCY,
+        max_attempts=settings.TASK_MAX_ATTEMPTS,
+        retry_backoff=settings.TASK_RETRY_BACKOFF,
+    )
+
+
+task_queue = create_task_queue()
+
+
+@event.listens_for(Session, "after_commit")
+def _submit_pending_tasks(session: Session) -> None:
+    for queue, name, payload in session.info.pop(PENDING_TASKS, []):
+        queue.committed(name, payload)
+
+
+@event.listens_for(Session, "after_soft_rollback")
+def _drop_pending_tasks(session: Session, previous_transaction) -> None:
+    if not session.in_transaction():
+        session.info.pop(PENDING_TASKS, None)
+
+
+@task_handler("invalidate_cache_tags")
+async def invalidate_cache_tags(tags: List[str]) -> None:
+    for tag in tags:
+        await response_cache.invalidate_tag(tag)
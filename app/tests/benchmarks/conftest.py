@@ -0,0 +1,122 @@
+import random
+import uuid
+from datetime import datetime, timedelta
+from unittest import mock
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.cache import MemoryResponseCache
+from app.conf import settings
+from app.database import Base, get_db
+from app.main import app
+from app.models import Article, Like, User
+from app.tests.benchmarks.utils import (
+    BENCH_ARTICLES,
+    BENCH_BASELINE_PATH,
+    BENCH_LIKES,
+    BENCH_PASSWORD,
+    BENCH_RESULTS_PATH,
+    BENCH_SEED,
+    BENCH_UPDATE_BASELINE,
+    BENCH_USERS,
+    save_results,
+)
+from app.utils import get_password_hash
+
+
+def pytest_collection_modifyitems(items):
+    # Everything in this folder is a benchmark, excluded from the default run
+    for item in items:
+        if "benchmarks" in item.path.parts:
+            item.add_marker(pytest.mark.benchmark)
+
+
+@pytest.fixture(scope="module")
+async def bench_dataset(engine):
+    # Deterministic dataset of BENCH_USERS users, BENCH_ARTICLES articles and BENCH_LIKES likes
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    rng = random.Random(BENCH_SEED)
+    new_id = lambda: uuid.UUID(int=rng.getrandbits(128), version=4)
+    now = datetime.now()
+    password = get_password_hash(BENCH_PASSWORD)
+    users = [
+        {
+            "id": new_id(),
+            "name": f"User {i}",
+            "email": f"user{i}@bench.test",
+            "password": password,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for i in range(BENCH_USERS)
+    ]
+    articles = [
+        {
+            "id": new_id(),
+            "title": f"Article {i}",
+            "slug": f"article-{i}",
+            "desc": f"Benchmark article number {i}",
+            "likes_count": 0,
+            "created_at": now - timedelta(seconds=i),
+            "updated_at": now - timedelta(seconds=i),
+        }
+        for i in range(BENCH_ARTICLES)
+    ]
+    likes = []
+    pairs = rng.sample(
+        range(BENCH_USERS * BENCH_ARTICLES),
+        min(BENCH_LIKES, BENCH_USERS * BENCH_ARTICLES),
+    )
+    for pair in pairs:
+        user, article = users[pair // BENCH_ARTICLES], articles[pair % BENCH_ARTICLES]
+        article["likes_count"] += 1
+        likes.append(
+            {
+                "id": new_id(),
+                "user_id": user["id"],
+                "article_id": article["id"],
+                "created_at": now,
+                "updated_at": now,
+            }
+        )
+
+    async with engine.begin() as conn:
+        for model, rows in [(User, users), (Article, articles), (Like, likes)]:
+            for start in range(0, len(rows), 5000):
+                await conn.execute(insert(model), rows[start : start + 5000])
+    return {"users": users, "articles": articles}
+
+
+@pytest.fixture(scope="module")
+async def bench_client(engine, bench_dataset):
+    SessionPerRequest = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def overide_get_db():
+        async with SessionPerRequest() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = overide_get_db
+    # Benchmark the database path rather than the response cache, and measure
+    # capacity rather than the rate limits
+    with mock.patch(
+        "app.routes.response_cache", MemoryResponseCache(0, ttl=0)
+    ), mock.patch.object(settings, "RATE_LIMIT_ENABLED", False):
+        async with AsyncClient(app=app, base_url="http://test/api/v1") as client:
+            yield client
+
+
+@pytest.fixture(scope="session")
+def bench_report():
+    # Collects results from every benchmark and stores them once the run ends
+    results = {}
+    yield results
+    if results:
+        save_results(BENCH_RESULTS_PATH, results)
+        if BENCH_UPDATE_BASELINE:
+            save_results(BENCH_BASELINE_PATH, results)
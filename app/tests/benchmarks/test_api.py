@@ -0,0 +1,74 @@
+from app.tests.benchmarks.utils import BENCH_PASSWORD, check_result, run_benchmark
+from app.utils import create_auth_token, encode_cursor
+
+PAGE_LIMIT = 20
+
+
+async def test_login_benchmark(bench_client, bench_dataset, bench_report):
+    users = bench_dataset["users"]
+    result = await run_benchmark(
+        "login",
+        lambda n: bench_client.post(
+            "/auth/login",
+            json={"email": users[n % len(users)]["email"], "password": BENCH_PASSWORD},
+        ),
+    )
+    check_result(bench_report, result)
+
+
+async def test_articles_list_benchmark(bench_client, bench_dataset, bench_report):
+    # Cursors for every page, in the endpoint's (created_at, id) descending order
+    articles = sorted(
+        bench_dataset["articles"],
+        key=lambda article: (article["created_at"], article["id"]),
+        reverse=True,
+    )
+    cursors = [None] + [
+        encode_cursor(article["created_at"], article["id"])
+        for article in articles[PAGE_LIMIT - 1 : -1 : PAGE_LIMIT]
+    ]
+
+    def list_page(n):
+        params = {"limit": PAGE_LIMIT}
+        if cursors[n % len(cursors)]:
+            params["cursor"] = cursors[n % len(cursors)]
+        return bench_client.get("/articles", params=params)
+
+    result = await run_benchmark("articles_list", list_page)
+    check_result(bench_report, result)
+
+
+async def test_article_detail_benchmark(bench_client, bench_dataset, bench_report):
+    articles = bench_dataset["articles"]
+    result = await run_benchmark(
+        "article_detail",
+        lambda n: bench_client.get(
+            f"/articles/{articles[n * 7919 % len(articles)]['slug']}"
+        ),
+    )
+    check_result(bench_report, result)
+
+
+async def test_article_search_benchmark(bench_client, bench_dataset, bench_report):
+    # Article numbers are indexed as words, so each query matches a handful of rows
+    articles = len(bench_dataset["articles"])
+    result = await run_benchmark(
+        "article_search",
+        lambda n: bench_client.get(
+            "/articles/search", params={"q": f"article {n * 7919 % articles}"}
+        ),
+    )
+    check_result(bench_report, result)
+
+
+async def test_like_toggle_benchmark(bench_client, bench_dataset, bench_report):
+    users, articles = bench_dataset["users"], bench_dataset["articles"]
+    tokens = [create_auth_token(user["id"]) for user in users]
+    result = await run_benchmark(
+        "like_toggle",
+        lambda n: bench_client.get(
+            f"/articles/{articles[n * 7919 % len(articles)]['slug']}/like",
+            headers={"Authorization": f"Bearer {tokens[n % len(tokens)]}"},
+        ),
+    )
+    check_result(bench_report, result)
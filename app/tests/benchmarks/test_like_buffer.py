@@ -0,0 +1,36 @@
+from unittest import mock
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.conf import settings
+from app.like_buffer import LikeBuffer
+from app.tests.benchmarks.utils import check_result, run_benchmark
+from app.utils import create_auth_token
+
+
+async def test_like_toggle_write_behind_benchmark(
+    engine, bench_client, bench_dataset, bench_report
+):
+    # Same workload as the like_toggle benchmark, with toggles buffered and flushed in batches
+    users, articles = bench_dataset["users"], bench_dataset["articles"]
+    tokens = [create_auth_token(user["id"]) for user in users]
+    buffer = LikeBuffer(
+        async_sessionmaker(bind=engine, expire_on_commit=False),
+        settings.LIKE_FLUSH_INTERVAL,
+        settings.LIKE_FLUSH_MAX_BATCH,
+    )
+    with mock.patch.object(settings, "LIKE_WRITE_BEHIND", True), mock.patch(
+        "app.routes.like_buffer", buffer
+    ):
+        buffer.start()
+        result = await run_benchmark(
+            "like_toggle_write_behind",
+            lambda n: bench_client.get(
+                f"/articles/{articles[n * 7919 % len(articles)]['slug']}/like",
+                headers={"Authorization": f"Bearer {tokens[n % len(tokens)]}"},
+            ),
+        )
+        await buffer.stop()
+    print(f"{buffer.flushed} toggles written in {buffer.flushes} flushes")
+    assert not len(buffer)
+    check_result(bench_report, result)
@@ -0,0 +1,58 @@
+import time
+import tracemalloc
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models import Article
+from app.queries import articles_page_query
+from app.tests.benchmarks.utils import check_result, percentile
+
+PAGE_SIZE = 1000
+ROUNDS = 50
+
+
+async def profile_query(engine, query, load) -> dict:
+    Session = async_sessionmaker(bind=engine, expire_on_commit=False)
+    timings = []
+    for _ in range(ROUNDS):
+        async with Session() as db:
+            start = time.perf_counter()
+            load(await db.execute(query))
+            timings.append(time.perf_counter() - start)
+
+    # Memory is measured on a separate pass since tracing slows everything down
+    async with Session() as db:
+        tracemalloc.start()
+        rows = load(await db.execute(query))
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+    assert rows
+    return {
+        "requests": ROUNDS,
+        "concurrency": 1,
+        "throughput_rps": round(ROUNDS / sum(timings), 2),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+        "peak_memory_kb": round(peak / 1024, 1),
+    }
+
+
+async def test_projected_vs_entity_queries(engine, bench_dataset, bench_report):
+    entities = await profile_query(
+        engine,
+        select(Article)
+        .order_by(Article.created_at.desc(), Article.id.desc())
+        .limit(PAGE_SIZE),
+        lambda result: result.scalars().all(),
+    )
+    projected = await profile_query(
+        engine,
+        articles_page_query(None, PAGE_SIZE),
+        lambda result: result.all(),
+    )
+    check_result(bench_report, {"name": "query_entities", **entities})
+    check_result(bench_report, {"name": "query_projected", **projected})
+    assert projected["peak_memory_kb"] < entities["peak_memory_kb"]
+    assert projected["p50_ms"] < entities["p50_ms"]
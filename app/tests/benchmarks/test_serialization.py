@@ -0,0 +1,58 @@
+import time
+from datetime import datetime
+
+from app.conf import settings
+from app.schemas import ArticlesResponseSchema
+from app.serializers import article_data, render_response
+from app.tests.benchmarks.utils import check_result, percentile
+
+ITEMS = 100
+ROUNDS = 200
+
+
+def time_render(articles) -> list:
+    timings = []
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        render_response(
+            ArticlesResponseSchema,
+            {
+                "message": "Articles fetched successfully",
+                "data": [article_data(article) for article in articles],
+                "next_cursor": None,
+            },
+        )
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def summarize(name: str, timings: list) -> dict:
+    return {
+        "name": name,
+        "requests": len(timings),
+        "concurrency": 1,
+        "throughput_rps": round(len(timings) / sum(timings), 2),
+        "p50_ms": round(percentile(timings, 50) * 1000, 3),
+        "p95_ms": round(percentile(timings, 95) * 1000, 3),
+        "p99_ms": round(percentile(timings, 99) * 1000, 3),
+    }
+
+
+def test_fast_json_serialization(mocker, bench_report):
+    now = datetime.now()
+    values = [
+        (f"Article {i}", f"article-{i}", "Benchmark article", i, now, now)
+        for i in range(ITEMS)
+    ]
+
+    # Default path: rows validated and encoded by pydantic
+    mocker.patch.object(settings, "FAST_JSON", False)
+    standard = summarize("serialize_standard", time_render(values))
+
+    # Fast path: rows encoded with orjson
+    mocker.patch.object(settings, "FAST_JSON", True)
+    fast = summarize("serialize_fast", time_render(values))
+
+    check_result(bench_report, standard)
+    check_result(bench_report, fast)
+    assert fast["p50_ms"] < standard["p50_ms"]
@@ -0,0 +1,68 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+import pytest
+
+from app.tests.benchmarks.utils import BENCH_CONCURRENCY, BENCH_REQUESTS
+
+MULTI_WORKERS = min(os.cpu_count() or 1, 4)
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def server_throughput(engine, workers: int) -> float:
+    # Runs the production entry point against the benchmark database and
+    # measures requests per second over real HTTP
+    port = free_port()
+    env = {
+        **os.environ,
+        "SQLALCHEMY_DATABASE_URL": engine.url.render_as_string(hide_password=False),
+        "WEB_CONCURRENCY": str(workers),
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+        "RESPONSE_CACHE_TTL": "0",
+        "RESPONSE_CACHE_ALLOW_PER_WORKER": "true",
+    }
+    server = subprocess.Popen([sys.executable, "-m", "app.server"], env=env)
+    try:
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as client:
+            for _ in range(100):
+                try:
+                    await client.get("/api/v1/healthcheck")
+                    break
+                except httpx.TransportError:
+                    await asyncio.sleep(0.1)
+
+            numbers = iter(range(BENCH_REQUESTS))
+
+            async def worker():
+                for _ in numbers:
+                    response = await client.get("/api/v1/articles")
+                    assert response.status_code == 200
+
+            start = time.perf_counter()
+            await asyncio.gather(*[worker() for _ in range(BENCH_CONCURRENCY)])
+            return BENCH_REQUESTS / (time.perf_counter() - start)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+@pytest.mark.skipif(MULTI_WORKERS < 2, reason="needs more than one CPU")
+async def test_single_vs_multi_worker_throughput(engine, bench_dataset):
+    single = await server_throughput(engine, workers=1)
+    multi = await server_throughput(engine, workers=MULTI_WORKERS)
+    print(
+        f"/articles: {single:.0f} req/s with 1 worker, "
+        f"{multi:.0f} req/s with {MULTI_WORKERS} workers"
+    )
+    assert multi > single
@@ -0,0 +1,52 @@
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+from app.tests.benchmarks.test_server import free_port
+from app.tests.benchmarks.utils import percentile
+
+# Limits on a cold start, in seconds
+MAX_IMPORT_TIME = float(os.environ.get("BENCH_MAX_IMPORT_TIME", 1.5))
+MAX_TIME_TO_FIRST_RESPONSE = float(os.environ.get("BENCH_MAX_FIRST_RESPONSE", 3))
+
+
+def test_import_time():
+    # A fresh interpreter each time, as on a machine that was scaled to zero
+    samples = []
+    for _ in range(5):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "import app.main"], check=True)
+        samples.append(time.perf_counter() - start)
+    print(f"import app.main: {percentile(samples, 50) * 1000:.0f}ms")
+    assert percentile(samples, 50) < MAX_IMPORT_TIME
+
+
+def test_time_to_first_response(engine):
+    port = free_port()
+    env = {
+        **os.environ,
+        "SQLALCHEMY_DATABASE_URL": engine.url.render_as_string(hide_password=False),
+        "WEB_CONCURRENCY": "1",
+        "HOST": "127.0.0.1",
+        "PORT": str(port),
+    }
+    start = time.perf_counter()
+    server = subprocess.Popen([sys.executable, "-m", "app.server"], env=env)
+    try:
+        while True:
+            try:
+                response = httpx.get(f"http://127.0.0.1:{port}/api/v1/healthcheck")
+                break
+            except httpx.TransportError:
+                assert time.perf_counter() - start < 30, "server didn't start"
+                time.sleep(0.01)
+        elapsed = time.perf_counter() - start
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+    assert response.status_code == 200
+    print(f"process start to first response: {elapsed * 1000:.0f}ms")
+    assert elapsed < MAX_TIME_TO_FIRST_RESPONSE
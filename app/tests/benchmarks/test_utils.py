@@ -0,0 +1,20 @@
+from app.tests.benchmarks.utils import find_regressions, percentile
+
+
+def test_percentile():
+    samples = [float(value) for value in range(1, 101)]
+    assert percentile(samples, 50) == 51.0
+    assert percentile(samples, 99) == 99.0
+
+
+def test_find_regressions():
+    baseline = {"p50_ms": 10, "p95_ms": 20, "p99_ms": 30, "throughput_rps": 100}
+    within = {"p50_ms": 11, "p95_ms": 22, "p99_ms": 33, "throughput_rps": 90}
+    assert find_regressions(within, baseline, threshold=0.2) == []
+    assert find_regressions(within, None) == []
+
+    slower = {"p50_ms": 10, "p95_ms": 20, "p99_ms": 40, "throughput_rps": 70}
+    assert find_regressions(slower, baseline, threshold=0.2) == [
+        "p99_ms 40 > baseline 30",
+        "throughput_rps 70 < baseline 100",
+    ]
@@ -0,0 +1,119 @@
+import asyncio
+import json
+import os
+import time
+from pathlib import Path
+from typing import Awaitable, Callable, List, Optional
+
+# Dataset and run size, overridable from the environment
+BENCH_SEED = int(os.environ.get("BENCH_SEED", 42))
+BENCH_USERS = int(os.environ.get("BENCH_USERS", 100))
+BENCH_ARTICLES = int(os.environ.get("BENCH_ARTICLES", 1000))
+BENCH_LIKES = int(os.environ.get("BENCH_LIKES", 5000))
+BENCH_REQUESTS = int(os.environ.get("BENCH_REQUESTS", 500))
+BENCH_CONCURRENCY = int(os.environ.get("BENCH_CONCURRENCY", 10))
+BENCH_PASSWORD = "benchpassword"
+
+# Allowed slowdown versus the baseline before a benchmark fails, 0.2 = 20%
+BENCH_THRESHOLD = float(os.environ.get("BENCH_THRESHOLD", 0.2))
+BENCH_RESULTS_PATH = Path(os.environ.get("BENCH_RESULTS_PATH", "bench_results.json"))
+BENCH_BASELINE_PATH = Path(
+    os.environ.get("BENCH_BASELINE_PATH", Path(__file__).parent / "baseline.json")
+)
+BENCH_UPDATE_BASELINE = os.environ.get("BENCH_UPDATE_BASELINE") == "1"
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, round(pct / 100 * (len(ordered) - 1)))
+    return ordered[index]
+
+
+async def measure_latencies(
+    request: Callable[[], Awaitable], iterations: int
+) -> List[float]:
+    # Sequential requests so each sample is pure request latency
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        response = await request()
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code < 400
+    return latencies
+
+
+async def run_benchmark(
+    name: str,
+    request: Callable[[int], Awaitable],
+    requests: int = BENCH_REQUESTS,
+    concurrency: int = BENCH_CONCURRENCY,
+) -> dict:
+    # `request` receives the request number so callers can vary their inputs
+    latencies = []
+    numbers = iter(range(requests))
+
+    async def worker():
+        for number in numbers:
+            start = time.perf_counter()
+            response = await request(number)
+            latencies.append(time.perf_counter() - start)
+            assert response.status_code < 400, response.text
+
+    start = time.perf_counter()
+    await asyncio.gather(*[worker() for _ in range(concurrency)])
+    elapsed = time.perf_counter() - start
+    return {
+        "name": name,
+        "requests": requests,
+        "concurrency": concurrency,
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+    }
+
+
+def load_baseline() -> dict:
+    if not BENCH_BASELINE_PATH.exists():
+        return {}
+    return json.loads(BENCH_BASELINE_PATH.read_text())["results"]
+
+
+def save_results(path: Path, results: dict) -> None:
+    dataset = {
+        "seed": BENCH_SEED,
+        "users": BENCH_USERS,
+        "articles": BENCH_ARTICLES,
+        "likes": BENCH_LIKES,
+    }
+    path.write_text(
+        json.dumps({"dataset": dataset, "results": results}, indent=2) + "\n"
+    )
+
+
+def find_regressions(
+    result: dict, baseline: Optional[dict], threshold: float = BENCH_THRESHOLD
+) -> List[str]:
+    if not baseline:
+        return []
+    regressions = []
+    for metric in ["p50_ms", "p95_ms", "p99_ms"]:
+        if result[metric] > baseline[metric] * (1 + threshold):
+            regressions.append(
+                f"{metric} {result[metric]} > baseline {baseline[metric]}"
+            )
+    if result["throughput_rps"] < baseline["throughput_rps"] * (1 - threshold):
+        regressions.append(
+            f"throughput_rps {result['throughput_rps']} < baseline {baseline['throughput_rps']}"
+        )
+    return regressions
+
+
+def check_result(bench_report: dict, result: dict) -> None:
+    # Records the result for this run and fails on a regression against the baseline
+    print(result)
+    bench_report[result["name"]] = result
+    if BENCH_UPDATE_BASELINE:
+        return
+    regressions = find_regressions(result, load_baseline().get(result["name"]))
+    assert not regressions, f"{result['name']} regressed: {regressions}"
@@ -1,5 +1,7 @@
 from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 
+from app.cache import response_cache
+from app.rate_limit import rate_limiter
 from app.main import app
 from app.database import get_db, Base
 from pytest_postgresql import factories
@@ -57,6 +59,18 @@ async def database(engine):
         yield db
 
 
+@pytest.fixture(autouse=True)
+async def clear_response_cache():
+    # Every test starts from a fresh database, so cached payloads must go too
+    await response_cache.clear()
+
+
+@pytest.fixture(autouse=True)
+async def reset_rate_limits():
+    # Keeps requests of earlier tests from counting against the limits
+    await rate_limiter.clear()
+
+
 @pytest.fixture
 async def client(database):
     async def overide_get_db():
@@ -70,6 +84,20 @@ async def client(database):
         yield client
 
 
+@pytest.fixture
+async def concurrent_client(engine, database):
+    # Gives every request its own session so requests can run concurrently
+    SessionPerRequest = async_sessionmaker(bind=engine, expire_on_commit=False)
+
+    async def overide_get_db():
+        async with SessionPerRequest() as db:
+            yield db
+
+    app.dependency_overrides[get_db] = overide_get_db
+    async with AsyncClient(app=app, base_url="http://test/api/v1") as client:
+        yield client
+
+
 @pytest.fixture
 async def test_user(database):
     user = User(
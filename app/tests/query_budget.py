@@ -0,0 +1,55 @@
+"""
+Pytest plugin that fails a test when a request it makes runs more SQL
+statements than its endpoint's budget. Override the budget for a single test
+with @pytest.mark.query_budget(n).
+"""
+
+from collections import defaultdict
+
+import pytest
+
+from app.profiling import profile_observers
+
+# Statements allowed per request, keyed by "METHOD route template"
+QUERY_BUDGETS = {
+    "POST /api/v1/auth/login": 1,
+    "GET /api/v1/articles": 2,
+    "GET /api/v1/articles/search": 2,
+    "GET /api/v1/articles/trending": 2,
+    "GET /api/v1/articles/{slug:str}": 2,
+    "GET /api/v1/articles/likes/stream": 1,
+    "POST /api/v1/articles/likes/status": 2,
+    "GET /api/v1/articles/{slug:str}/like": 2,
+    "POST /api/v1/likes/batch": 6,
+}
+DEFAULT_QUERY_BUDGET = 5
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "query_budget(n): SQL statements allowed per request in this test"
+    )
+
+
+@pytest.hookimpl(wrapper=True)
+def pytest_runtest_call(item):
+    marker = item.get_closest_marker("query_budget")
+    over_budget = defaultdict(int)
+
+    def check(endpoint, profile):
+        budget = marker.args[0] if marker else QUERY_BUDGETS.get(endpoint)
+        if profile.count > (DEFAULT_QUERY_BUDGET if budget is None else budget):
+            over_budget[endpoint] = max(over_budget[endpoint], profile.count)
+
+    profile_observers.append(check)
+    try:
+        result = yield
+    finally:
+        profile_observers.remove(check)
+    if over_budget:
+        pytest.fail(
+            "Query budget exceeded: "
+            + ", ".join(f"{endpoint} ran {n}" for endpoint, n in over_budget.items()),
+            pytrace=False,
+        )
+    return result
@@ -0,0 +1,132 @@
+import pytest
+from pydantic import ValidationError
+
+from app.cache import MemoryResponseCache, RedisResponseCache, TTLCache
+from app.conf import Settings
+
+
+def test_ttl_cache_evicts_least_recently_used():
+    cache = TTLCache(maxsize=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "a" is now most recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == 1
+    assert cache.get("c") == 3
+    assert cache.stats() == {"size": 2, "maxsize": 2, "hits": 3, "misses": 1}
+
+
+def test_ttl_cache_expires_entries(mocker):
+    monotonic = mocker.patch("app.cache.time.monotonic", return_value=100.0)
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set("a", 1)
+    assert cache.get("a") == 1
+
+    monotonic.return_value = 105.0
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
+
+    # Verify explicit invalidation
+    cache.set("b", 2)
+    cache.invalidate("b")
+    assert cache.get("b") is None
+
+    # Verify that a shorter ttl can be set per entry
+    cache.set("c", 3, ttl=1)
+    monotonic.return_value = 106.0
+    assert cache.get("c") is None
+
+
+class FakeRedis:
+    """Local stand-in for the subset of redis.asyncio used by the response cache"""
+
+    def __init__(self):
+        self.data = {}
+
+    def register_script(self, script):
+        # Mirrors RedisResponseCache.SET_SCRIPT, the only script registered
+        async def run(keys, args):
+            n = (len(keys) - 1) // 2
+            value, _, _, generation = args
+            versions = [int(self.data.get(key, 0)) for key in keys[1 + n :]]
+            if generation != "" and any(v > generation for v in versions):
+                return 0
+            self.data[keys[0]] = value
+            for tag_key in keys[1 : 1 + n]:
+                await self.sadd(tag_key, keys[0])
+            return 1
+
+        return run
+
+    async def get(self, key):
+        return self.data.get(key)
+
+    async def set(self, key, value, ex=None):
+        self.data[key] = value
+
+    async def incr(self, key):
+        self.data[key] = int(self.data.get(key, 0)) + 1
+        return self.data[key]
+
+    async def sadd(self, key, *members):
+        self.data.setdefault(key, set()).update(members)
+
+    async def smembers(self, key):
+        return set(self.data.get(key, set()))
+
+    async def expire(self, key, seconds):
+        pass
+
+    async def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    async def scan_iter(self, match):
+        for key in list(self.data):
+            if key.startswith(match.rstrip("*")):
+                yield key
+
+
+async def test_response_cache_backends():
+    for cache in [
+        MemoryResponseCache(maxsize=10, ttl=60),
+        RedisResponseCache(FakeRedis(), ttl=60),
+    ]:
+        await cache.set("articles:page-1", b"page-1", ["article:a", "article:b"])
+        await cache.set("article:a", b"a", ["article:a"])
+        await cache.set("article:b", b"b", ["article:b"])
+
+        # Verify that invalidating a tag drops every payload containing it
+        await cache.invalidate_tag("article:a")
+        assert await cache.get("articles:page-1") is None
+        assert await cache.get("article:a") is None
+        assert await cache.get("article:b") == b"b"
+
+        # Verify that a fill built before an invalidation of its tags is skipped
+        generation = await cache.generation()
+        await cache.invalidate_tag("article:b")
+        assert not await cache.set(
+            "article:b", b"stale", ["article:b"], None, generation
+        )
+        assert await cache.get("article:b") is None
+        generation = await cache.generation()
+        assert await cache.set("article:b", b"b", ["article:b"], None, generation)
+        assert await cache.get("article:b") == b"b"
+
+        await cache.clear()
+        assert await cache.get("article:b") is None
+
+
+def test_memory_response_cache_workers():
+    # Verify that a per-worker cache is refused with several workers unless allowed
+    Settings(RESPONSE_CACHE_BACKEND="memory", WEB_CONCURRENCY=1)
+    Settings(RESPONSE_CACHE_BACKEND="redis", WEB_CONCURRENCY=4)
+    Settings(
+        RESPONSE_CACHE_BACKEND="memory",
+        WEB_CONCURRENCY=4,
+        RESPONSE_CACHE_ALLOW_PER_WORKER=True,
+    )
+    with pytest.raises(ValidationError):
+        Settings(RESPONSE_CACHE_BACKEND="memory", WEB_CONCURRENCY=4)
@@ -0,0 +1,21 @@
+from sqlalchemy import update
+
+from app.commands import reconcile_likes_count
+from app.models import Article, Like
+
+
+async def test_reconcile_likes_count(database, test_article, test_user):
+    # Simulate drift between the counter and the likes table
+    database.add(Like(user_id=test_user.id, article_id=test_article.id))
+    await database.execute(
+        update(Article).where(Article.id == test_article.id).values(likes_count=5)
+    )
+    await database.commit()
+
+    # Verify that the drifted article is repaired
+    assert await reconcile_likes_count(database) == 1
+    await database.refresh(test_article)
+    assert test_article.likes_count == 1
+
+    # Verify that nothing is touched once counts are consistent
+    assert await reconcile_likes_count(database) == 0
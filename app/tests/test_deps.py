@@ -0,0 +1,72 @@
+import uuid
+from datetime import UTC, datetime
+from http.cookies import SimpleCookie
+
+from fastapi import Response
+from fastapi.security import HTTPAuthorizationCredentials
+
+from app.deps import get_optional_user_id, get_read_db
+from app.revocation import revocations
+from app.utils import (
+    WRITE_MARKER_COOKIE,
+    create_auth_token,
+    mark_recent_write,
+    recent_writers,
+)
+
+
+async def test_get_read_db_routing(mocker):
+    primary_db, replica_db = object(), object()
+    replica_session = mocker.MagicMock()
+    replica_session.return_value.__aenter__.return_value = replica_db
+    mocker.patch("app.database.ReplicaSessionLocal", replica_session)
+    monitor = mocker.patch("app.database.replica_monitor")
+    monitor.is_usable = mocker.AsyncMock(return_value=True)
+
+    user_id = uuid.uuid4()
+    token = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_auth_token(user_id)
+    )
+
+    # Verify that reads go to a healthy replica
+    assert await anext(get_read_db(token, primary_db, None)) is replica_db
+
+    # Verify that reads fall back to the primary when the replica lags
+    monitor.is_usable.return_value = False
+    assert await anext(get_read_db(token, primary_db, None)) is primary_db
+
+    # Verify that a user who just wrote reads from the primary
+    monitor.is_usable.return_value = True
+    mark_recent_write(user_id)
+    assert await anext(get_read_db(token, primary_db, None)) is primary_db
+    assert await anext(get_read_db(None, primary_db, None)) is replica_db
+
+    # Verify that the write marker cookie keeps the writer on the primary in a
+    # worker that didn't serve the write
+    response = Response()
+    mark_recent_write(user_id, response)
+    recent_writers.clear()
+    cookie = SimpleCookie(response.headers["set-cookie"])
+    marker = cookie[WRITE_MARKER_COOKIE].value
+    assert await anext(get_read_db(token, primary_db, marker)) is primary_db
+    assert await anext(get_read_db(token, primary_db, None)) is replica_db
+
+    # Verify that markers of other users and auth tokens don't count
+    other = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_auth_token(uuid.uuid4())
+    )
+    assert await anext(get_read_db(other, primary_db, marker)) is replica_db
+    assert await anext(get_read_db(token, primary_db, token.credentials)) is replica_db
+
+
+async def test_get_optional_user_id_rejects_revoked_tokens(mocker):
+    user_id = uuid.uuid4()
+    token = HTTPAuthorizationCredentials(
+        scheme="Bearer", credentials=create_auth_token(user_id)
+    )
+    assert await get_optional_user_id(token) == user_id
+
+    # Verify that a revoked token is treated as an anonymous request
+    mocker.patch.object(revocations, "users", {})
+    revocations.add(None, user_id, datetime.now(UTC))
+    assert await get_optional_user_id(token) is None
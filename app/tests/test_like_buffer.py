@@ -0,0 +1,136 @@
+import uuid
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.like_buffer import FLUSH_MAX_ATTEMPTS, LikeBuffer
+from app.models import Like, User
+
+
+async def test_like_buffer_coalesces_and_flushes(engine, database, test_article):
+    users = [
+        User(name=f"User {i}", email=f"user{i}@example.com", password="")
+        for i in range(3)
+    ]
+    database.add_all(users)
+    await database.commit()
+    buffer = LikeBuffer(
+        async_sessionmaker(bind=engine, expire_on_commit=False),
+        interval=60,
+        max_batch=100,
+    )
+
+    # Toggles are answered from the buffer before anything is written
+    for user in users:
+        assert await buffer.toggle(database, test_article.slug, user.id) == (
+            True,
+            users.index(user) + 1,
+        )
+    assert await buffer.toggle(database, test_article.slug, users[0].id) == (False, 2)
+    assert await buffer.toggle(database, "invalid_slug", users[0].id) is None
+    assert len(buffer) == 3
+
+    # Verify that a flush writes only the final state of each (user, article)
+    assert await buffer.flush() == 3
+    likes = select(Like.user_id).where(Like.article_id == test_article.id)
+    assert set((await database.execute(likes)).scalars().all()) == {
+        users[1].id,
+        users[2].id,
+    }
+    await database.refresh(test_article)
+    assert test_article.likes_count == 2
+
+    # Verify that replaying a state that is already stored leaves the counter alone
+    assert await buffer.toggle(database, test_article.slug, users[0].id) == (True, 3)
+    await buffer.toggle(database, test_article.slug, users[0].id)
+    await buffer.stop()
+    await database.refresh(test_article)
+    count = select(func.count()).where(Like.article_id == test_article.id)
+    assert test_article.likes_count == (await database.execute(count)).scalar() == 2
+
+
+async def test_like_buffer_skips_deleted_users(engine, database, test_article):
+    users = [
+        User(name=f"User {i}", email=f"user{i}@example.com", password="")
+        for i in range(2)
+    ]
+    database.add_all(users)
+    await database.commit()
+    buffer = LikeBuffer(
+        async_sessionmaker(bind=engine, expire_on_commit=False),
+        interval=60,
+        max_batch=100,
+    )
+    for user in users:
+        await buffer.toggle(database, test_article.slug, user.id)
+
+    # Verify that a user deleted before the flush doesn't fail the whole batch
+    await database.delete(users[0])
+    await database.commit()
+    assert await buffer.flush() == 2
+    assert len(buffer) == 0
+    likes = select(Like.user_id).where(Like.article_id == test_article.id)
+    assert (await database.execute(likes)).scalars().all() == [users[1].id]
+    await database.refresh(test_article)
+    assert test_article.likes_count == 1
+
+
+async def test_like_buffer_drops_failing_batches(mocker, database, test_article):
+    mocker.patch("app.like_buffer.write_likes", side_effect=RuntimeError)
+    buffer = LikeBuffer(mocker.MagicMock(), interval=60, max_batch=100)
+    await buffer.toggle(database, test_article.slug, uuid.uuid4())
+
+    # Verify that failed batches are retried, but not forever, and that no
+    # toggles are accepted meanwhile
+    for _ in range(FLUSH_MAX_ATTEMPTS - 1):
+        assert await buffer.flush() == 0
+        assert len(buffer) == 1
+        assert not buffer.accepting
+    assert await buffer.flush() == 0
+    assert len(buffer) == 0
+    assert buffer.dropped == 1
+    assert buffer.accepting
+
+
+async def test_like_buffer_write_through(mocker, database, test_article, test_user):
+    buffer = LikeBuffer(mocker.MagicMock(), interval=60, max_batch=100)
+    assert await buffer.toggle(database, test_article.slug, test_user.id) == (True, 1)
+
+    # Verify that a synchronous toggle starts from the buffered like, which it
+    # replaces, so the flusher can't overwrite it later
+    assert await buffer.write_through(database, test_article.slug, test_user.id) == (
+        False,
+        0,
+    )
+    await database.commit()
+    assert len(buffer) == 0
+    await database.refresh(test_article)
+    assert test_article.likes_count == 0
+    assert await buffer.write_through(database, "invalid_slug", test_user.id) is None
+
+
+async def test_like_buffer_toggle_during_flush(mocker):
+    mocker.patch("app.like_buffer.write_likes", mocker.AsyncMock(return_value=[]))
+    session_factory = mocker.MagicMock()
+    session_factory.return_value.__aenter__.return_value.commit = mocker.AsyncMock()
+    buffer = LikeBuffer(session_factory, interval=60, max_batch=100)
+    user_id, article_id = uuid.uuid4(), uuid.uuid4()
+
+    def database(rows):
+        # Answers like state reads with `rows`, flushing during the first one
+        async def execute(query):
+            row = rows.pop(0)
+            if rows:
+                await buffer.flush()
+            return mocker.MagicMock(**{"one_or_none.return_value": row})
+
+        return mocker.MagicMock(execute=execute)
+
+    db = database([(article_id, 0, False)])
+    assert await buffer.toggle(db, "slug", user_id) == (True, 1)
+
+    # Verify that a toggle whose read raced with the flush committing the like
+    # reads again instead of combining the old state with an emptied buffer
+    db = database([(article_id, 0, False), (article_id, 1, True)])
+    assert await buffer.toggle(db, "slug", user_id) == (False, 0)
+    assert len(buffer) == 1
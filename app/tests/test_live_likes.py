@@ -0,0 +1,46 @@
+import asyncio
+
+from app.live_likes import LikeCountListener, LikeCountSubscription
+from app.utils import create_auth_token
+
+
+def test_subscription_coalesces_updates():
+    listener = LikeCountListener("postgresql://unused")
+    subscription = LikeCountSubscription(["first", "second"])
+    for slug in subscription.slugs:
+        listener.subscriptions[slug].add(subscription)
+
+    listener.dispatch('{"slug": "first", "likes_count": 1}')
+    listener.dispatch('{"slug": "first", "likes_count": 2}')
+    listener.dispatch('{"slug": "other", "likes_count": 7}')
+    listener.dispatch("not json")
+    assert subscription._counts == {"first": 2}
+
+    listener.unsubscribe(subscription)
+    assert len(listener) == 0
+
+
+async def test_like_notifies_listener(engine, client, test_article, test_user):
+    url = engine.url.set(drivername="postgresql")
+    listener = LikeCountListener(url.render_as_string(hide_password=False))
+    subscription = listener.subscribe([test_article.slug])
+    try:
+        # Let the listener connect before the like is committed
+        await asyncio.sleep(0.5)
+        token = create_auth_token(test_user.id)
+        client.headers = {**client.headers, "Authorization": f"Bearer {token}"}
+        await client.get(f"/articles/{test_article.slug}/like")
+        counts = await asyncio.wait_for(subscription.get(), 5)
+        assert counts == {test_article.slug: 1}
+    finally:
+        listener.unsubscribe(subscription)
+        await listener.stop()
+
+
+async def test_likes_stream_validation(client):
+    response = await client.get("/articles/likes/stream")
+    assert response.status_code == 422
+
+    slugs = ",".join(f"slug-{i}" for i in range(101))
+    response = await client.get(f"/articles/likes/stream?slugs={slugs}")
+    assert response.status_code == 422
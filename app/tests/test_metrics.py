@@ -0,0 +1,21 @@
+from app.metrics import metrics
+
+
+async def test_metrics_endpoint(client, test_article):
+    metrics.clear()
+    await client.get(f"/articles/{test_article.slug}")
+    await client.get("/articles/invalid_slug")
+
+    response = await client.get("http://test/metrics")
+    assert response.status_code == 200
+    lines = response.text.splitlines()
+
+    # Verify that requests are labelled by route template rather than slug
+    route = 'method="GET",route="/api/v1/articles/{slug:str}"'
+    assert f'http_requests_total{{{route},status="200"}} 1' in lines
+    assert f'http_requests_total{{{route},status="404"}} 1' in lines
+    assert not any(test_article.slug in line for line in lines)
+
+    # Verify that the detail lookups were counted as database queries
+    assert f"http_request_db_queries_count{{{route}}} 2" in lines
+    assert f'http_request_db_queries_bucket{{{route},le="0"}} 0' in lines
@@ -0,0 +1,38 @@
+from app.profiling import QueryProfile
+
+
+def test_query_profile_flags_repeated_statements_and_row_blowups(mocker):
+    mocker.patch("app.profiling.settings.SQL_REPEATED_QUERY_THRESHOLD", 3)
+    mocker.patch("app.profiling.settings.SQL_ROW_COUNT_THRESHOLD", 100)
+    parent = QueryProfile()
+    profile = QueryProfile(parent)
+    for _ in range(3):
+        profile.record("SELECT likes WHERE article_id = %s", 0.001, 1)
+    profile.record("SELECT articles", 0.002, 500)
+
+    assert profile.repeated() == [("SELECT likes WHERE article_id = %s", 3)]
+    assert profile.row_blowups() == [("SELECT articles", 500)]
+    assert parent.count == profile.count == 4
+    assert profile.server_timing() == (
+        'db;dur=5.00;desc="4 queries", '
+        'db-repeated;desc="1 repeated statements", '
+        'db-rows;desc="500 rows in one statement"'
+    )
+
+
+async def test_server_timing_header(mocker, client, test_article):
+    mocker.patch("app.profiling.settings.DEBUG", False)
+    mocker.patch("app.profiling.settings.SQL_PROFILE_TOKEN", "secret")
+    mocker.patch("app.profiling.profile_observers", [])
+
+    # Verify that profiling needs the right token outside DEBUG
+    response = await client.get(
+        f"/articles/{test_article.slug}", headers={"X-Profile-SQL": "wrong"}
+    )
+    assert "server-timing" not in response.headers
+
+    response = await client.get(
+        "/articles/invalid_slug", headers={"X-Profile-SQL": "secret"}
+    )
+    assert response.headers["server-timing"].startswith("db;dur=")
+    assert response.headers["server-timing"].endswith('desc="1 queries"')
@@ -0,0 +1,111 @@
+import tomllib
+import uuid
+from pathlib import Path
+from unittest import mock
+
+from fastapi import FastAPI
+from httpx import ASGITransport, AsyncClient
+from uvicorn.middleware.proxy_headers import ProxyHeadersMiddleware
+
+from app.conf import settings
+from app.rate_limit import MemoryRateLimiter, RateLimitMiddleware
+from app.utils import create_auth_token
+
+limited_app = FastAPI()
+limited_app.add_middleware(RateLimitMiddleware, limiter=MemoryRateLimiter(100))
+
+
+@limited_app.get("/limited")
+async def limited():
+    return {"message": "ok"}
+
+
+async def test_memory_rate_limiter():
+    limiter = MemoryRateLimiter(max_keys=2)
+    assert [await limiter.acquire("a", 1, 2) for _ in range(2)] == [0, 0]
+    assert 0 < await limiter.acquire("a", 1, 2) <= 1
+
+    # Verify that the least recently used bucket is dropped beyond max_keys
+    await limiter.acquire("b", 1, 2)
+    await limiter.acquire("c", 1, 2)
+    assert list(limiter.buckets) == ["b", "c"]
+
+
+@mock.patch.object(settings, "RATE_LIMITS", {"GET /limited": (0.5, 2)})
+async def test_rate_limit_middleware():
+    async with AsyncClient(app=limited_app, base_url="http://test") as client:
+        responses = [await client.get("/limited") for _ in range(3)]
+        assert [response.status_code for response in responses] == [200, 200, 429]
+        assert responses[-1].headers["retry-after"] == "2"
+        assert responses[-1].json() == {
+            "status": "failure",
+            "message": "Too many requests, please try again later",
+        }
+
+        # Verify that authenticated clients get a bucket of their own
+        token = create_auth_token(uuid.uuid4())
+        headers = {"Authorization": f"Bearer {token}"}
+        response = await client.get("/limited", headers=headers)
+        assert response.status_code == 200
+
+        # Verify that requests are shed while the worker is overloaded
+        with mock.patch.object(settings, "ADMISSION_MAX_IN_FLIGHT", 0):
+            response = await client.get("/limited", headers=headers)
+        assert response.status_code == 503
+        assert response.headers["retry-after"] == "1"
+
+
+@mock.patch.object(settings, "RATE_LIMITS", {"GET /limited": (0.5, 2)})
+async def test_rate_limit_ignores_spoofed_forwarded_for():
+    # Mirrors how app.server configures uvicorn's proxy header handling
+    proxied_app = ProxyHeadersMiddleware(
+        limited_app, trusted_hosts=settings.FORWARDED_ALLOW_IPS
+    )
+
+    # Verify that a client that isn't a trusted proxy can't pick its address
+    transport = ASGITransport(app=proxied_app, client=("203.0.113.5", 4000))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        statuses = [
+            (
+                await client.get(
+                    "/limited", headers={"X-Forwarded-For": f"198.51.100.{i}"}
+                )
+            ).status_code
+            for i in range(3)
+        ]
+    assert statuses == [200, 200, 429]
+
+    # Verify that behind a trusted proxy, only the address it appended counts
+    transport = ASGITransport(app=proxied_app, client=("127.0.0.1", 4000))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        statuses = [
+            (
+                await client.get(
+                    "/limited",
+                    headers={"X-Forwarded-For": f"10.0.0.{i}, 198.51.100.7"},
+                )
+            ).status_code
+            for i in range(3)
+        ]
+    assert statuses == [200, 200, 429]
+
+
+@mock.patch.object(settings, "RATE_LIMITS", {"GET /limited": (0.5, 2)})
+async def test_rate_limit_behind_fly_proxy():
+    fly = tomllib.loads((Path(__file__).parents[2] / "fly.toml").read_text())
+    proxied_app = ProxyHeadersMiddleware(
+        limited_app, trusted_hosts=fly["env"]["FORWARDED_ALLOW_IPS"]
+    )
+
+    # Verify that clients behind fly-proxy get a bucket each
+    transport = ASGITransport(app=proxied_app, client=("172.19.4.2", 4000))
+    async with AsyncClient(transport=transport, base_url="http://test") as client:
+        statuses = [
+            (
+                await client.get(
+                    "/limited", headers={"X-Forwarded-For": f"198.51.100.{i}"}
+                )
+            ).status_code
+            for i in range(3)
+        ]
+    assert statuses == [200, 200, 200]
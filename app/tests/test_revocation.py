@@ -0,0 +1,37 @@
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.revocation import RevocationList, revoke
+from app.utils import create_auth_token, decode_token, decodeAuth
+
+
+async def test_stateless_auth_and_revocation(mocker, engine, database, test_user):
+    mocker.patch("app.utils.settings.AUTH_STATELESS", True)
+    execute = mocker.spy(database, "execute")
+    token = create_auth_token(test_user.id, test_user.name, test_user.email)
+
+    # Verify that the principal comes from the token claims alone
+    user = await decodeAuth(database, token)
+    assert (user.id, user.name, user.email) == (
+        test_user.id,
+        test_user.name,
+        test_user.email,
+    )
+    assert execute.call_count == 0
+
+    # Verify that a revoked token is rejected while others keep working
+    other_token = create_auth_token(test_user.id, test_user.name, test_user.email)
+    await revoke(database, jti=decode_token(token)["jti"])
+    assert await decodeAuth(database, token) is None
+    assert await decodeAuth(database, other_token) is not None
+
+    # Verify that deleting the user revokes all of their tokens
+    await database.delete(test_user)
+    await database.commit()
+    assert await decodeAuth(database, other_token) is None
+
+    # Verify that other workers load the same revocations on refresh
+    revocations = RevocationList(async_sessionmaker(bind=engine), refresh_interval=30)
+    await revocations.refresh()
+    for revoked in [token, other_token]:
+        claims = decode_token(revoked)
+        assert revocations.is_revoked(claims["jti"], claims["user_id"], claims["iat"])
@@ -1,4 +1,19 @@
-from app.utils import create_auth_token
+import asyncio
+from datetime import datetime, timedelta
+
+import orjson
+import pytest
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import IntegrityError
+
+from app.handlers import validation_exception_handler
+
+from app.models import Article, Like, User
+from app.schemas import LikeBatchRequestSchema, LikeStatusesRequestSchema
+from app.trending import refresh_trending
+from app.utils import create_auth_token, user_cache
 
 
 async def test_login(mocker, client, test_user):
@@ -36,6 +51,46 @@ async def test_retrieve_all_articles(client, test_article):
     data = result["data"]
     assert len(data) > 0
     assert any(isinstance(obj["title"], str) for obj in data)
+    assert result["next_cursor"] is None
+
+
+async def test_paginate_articles(client, database):
+    now = datetime.now()
+    database.add_all(
+        [
+            Article(
+                title=f"Article {i}",
+                slug=f"article-{i}",
+                desc="Paginated article",
+                created_at=now - timedelta(minutes=i),
+            )
+            for i in range(5)
+        ]
+    )
+    await database.commit()
+
+    # Verify that pages follow each other newest first without overlap
+    slugs = []
+    cursor = None
+    for _ in range(3):
+        params = {"limit": 2}
+        if cursor:
+            params["cursor"] = cursor
+        response = await client.get("/articles", params=params)
+        assert response.status_code == 200
+        result = response.json()
+        slugs += [obj["slug"] for obj in result["data"]]
+        cursor = result["next_cursor"]
+    assert slugs == [f"article-{i}" for i in range(5)]
+    assert cursor is None
+
+    # Verify that an error returns for an invalid cursor
+    response = await client.get("/articles", params={"cursor": "invalid"})
+    assert response.status_code == 400
+    assert response.json() == {
+        "status": "failure",
+        "message": "Invalid cursor",
+    }
 
 
 async def test_retrieve_article_detail(client, test_article):
@@ -52,6 +107,7 @@ async def test_retrieve_article_detail(client, test_article):
             "likes_count": test_article.likes_count,
             "created_at": test_article.created_at.isoformat(),
             "updated_at": test_article.updated_at.isoformat(),
+            "liked_by_me": False,
         },
     }
 
@@ -91,4 +147,359 @@ async def test_like_article(client, test_article, test_user):
     assert response.json() == {
         "status": "success",
         "message": "Like added successfully",
+        "data": {"liked": True, "likes_count": 1},
+    }
+
+    # Verify that the likes count is kept on the article
+    response = await client.get(f"/articles/{test_article.slug}")
+    assert response.json()["data"]["likes_count"] == 1
+
+    # Verify that liking again removes the like
+    response = await client.get(f"/articles/{test_article.slug}/like")
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "success",
+        "message": "Like removed successfully",
+        "data": {"liked": False, "likes_count": 0},
+    }
+    response = await client.get(f"/articles/{test_article.slug}")
+    assert response.json()["data"]["likes_count"] == 0
+
+
+async def test_auth_user_cache(client, database, test_article, test_user):
+    token = create_auth_token(test_user.id)
+    client.headers = {**client.headers, "Authorization": f"Bearer {token}"}
+
+    # Verify that repeated requests are served from the auth cache
+    await client.get(f"/articles/{test_article.slug}/like")
+    hits = user_cache.hits
+    await client.get(f"/articles/{test_article.slug}/like")
+    assert user_cache.hits == hits + 1
+
+    # Verify that deleting the user invalidates the cached principal
+    await database.delete(test_user)
+    await database.commit()
+    response = await client.get(f"/articles/{test_article.slug}/like")
+    assert response.status_code == 401
+    assert response.json() == {
+        "status": "failure",
+        "message": "Auth Token is Invalid or Expired",
+    }
+
+
+async def test_like_article_concurrently(concurrent_client, database, test_article):
+    users = [
+        User(name=f"User {i}", email=f"user{i}@example.com", password="")
+        for i in range(10)
+    ]
+    database.add_all(users)
+    await database.commit()
+
+    # Every user double-clicks the like button at the same time
+    responses = await asyncio.gather(
+        *[
+            concurrent_client.get(
+                f"/articles/{test_article.slug}/like",
+                headers={"Authorization": f"Bearer {create_auth_token(user.id)}"},
+            )
+            for user in users
+            for _ in range(5)
+        ]
+    )
+    assert all(response.status_code == 200 for response in responses)
+
+    # Verify that the counter matches the likes actually stored
+    likes = (
+        await database.execute(
+            select(Like.user_id, func.count())
+            .where(Like.article_id == test_article.id)
+            .group_by(Like.user_id)
+        )
+    ).all()
+    assert all(count == 1 for _, count in likes)
+    await database.refresh(test_article)
+    assert test_article.likes_count == len(likes)
+
+
+async def test_toggle_and_batch_likes_concurrently(
+    concurrent_client, database, test_article
+):
+    users = [
+        User(name=f"User {i}", email=f"user{i}@example.com", password="")
+        for i in range(10)
+    ]
+    database.add_all(users)
+    await database.commit()
+
+    # Toggles and batch writes of the same users and article interleave
+    requests = []
+    for user in users:
+        headers = {"Authorization": f"Bearer {create_auth_token(user.id)}"}
+        for action in ["like", "unlike", "like"]:
+            requests.append(
+                concurrent_client.get(
+                    f"/articles/{test_article.slug}/like", headers=headers
+                )
+            )
+            requests.append(
+                concurrent_client.post(
+                    "/likes/batch",
+                    json={
+                        "operations": [{"slug": test_article.slug, "action": action}]
+                    },
+                    headers=headers,
+                )
+            )
+    responses = await asyncio.gather(*requests)
+    assert all(response.status_code == 200 for response in responses)
+
+    # Verify that the counter matches the likes actually stored
+    await database.refresh(test_article)
+    count = select(func.count()).where(Like.article_id == test_article.id)
+    assert test_article.likes_count == (await database.execute(count)).scalar()
+
+
+async def test_article_detail_etag(client, test_article, test_user):
+    response = await client.get(f"/articles/{test_article.slug}")
+    assert response.status_code == 200
+    etag = response.headers["etag"]
+
+    # Verify that an unchanged article returns 304 without a body
+    response = await client.get(
+        f"/articles/{test_article.slug}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+
+    # Verify that liking the article invalidates the cached payload
+    token = create_auth_token(test_user.id)
+    await client.get(
+        f"/articles/{test_article.slug}/like",
+        headers={"Authorization": f"Bearer {token}"},
+    )
+    response = await client.get(
+        f"/articles/{test_article.slug}", headers={"If-None-Match": etag}
+    )
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["data"]["likes_count"] == 1
+
+
+async def test_liked_by_me(client, test_article, test_user):
+    token = create_auth_token(test_user.id)
+    headers = {"Authorization": f"Bearer {token}"}
+    await client.get(f"/articles/{test_article.slug}/like", headers=headers)
+
+    # Verify that the flag is set for the user who liked the article
+    response = await client.get(f"/articles/{test_article.slug}", headers=headers)
+    assert response.json()["data"]["liked_by_me"] is True
+    response = await client.get("/articles", headers=headers)
+    assert response.json()["data"][0]["liked_by_me"] is True
+
+    # Verify that anonymous requests share the unpersonalized payload
+    response = await client.get(f"/articles/{test_article.slug}")
+    assert response.json()["data"]["liked_by_me"] is False
+
+
+async def test_like_statuses(client, test_article, test_user):
+    response = await client.post(
+        "/articles/likes/status", json={"slugs": [test_article.slug]}
+    )
+    assert response.status_code == 401
+
+    token = create_auth_token(test_user.id)
+    client.headers = {**client.headers, "Authorization": f"Bearer {token}"}
+    await client.get(f"/articles/{test_article.slug}/like")
+
+    # Verify that liked, unknown and duplicated slugs are all answered
+    response = await client.post(
+        "/articles/likes/status",
+        json={"slugs": [test_article.slug, "invalid_slug", test_article.slug]},
+    )
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "success",
+        "message": "Like statuses fetched successfully",
+        "data": [
+            {"slug": test_article.slug, "liked": True},
+            {"slug": "invalid_slug", "liked": False},
+        ],
+    }
+
+    # Verify that oversized batches are rejected
+    response = await client.post(
+        "/articles/likes/status", json={"slugs": [f"slug-{i}" for i in range(101)]}
+    )
+    assert response.status_code == 422
+
+
+async def test_like_batch(client, test_article, test_user):
+    operations = [{"slug": test_article.slug, "action": "like"}]
+    response = await client.post("/likes/batch", json={"operations": operations})
+    assert response.status_code == 401
+
+    token = create_auth_token(test_user.id)
+    client.headers = {**client.headers, "Authorization": f"Bearer {token}"}
+    operations += [
+        {"slug": "invalid_slug", "action": "like"},
+        {"slug": test_article.slug, "action": "toggle"},
+    ]
+    response = await client.post("/likes/batch", json={"operations": operations})
+    assert response.status_code == 200
+    assert response.json() == {
+        "status": "success",
+        "message": "Likes updated successfully",
+        "data": [
+            {
+                "slug": test_article.slug,
+                "action": "like",
+                "liked": True,
+                "changed": True,
+                "error": None,
+            },
+            {
+                "slug": "invalid_slug",
+                "action": "like",
+                "liked": None,
+                "changed": False,
+                "error": "Article does not exist!",
+            },
+            {
+                "slug": test_article.slug,
+                "action": "toggle",
+                "liked": None,
+                "changed": False,
+                "error": "Invalid action",
+            },
+        ],
+    }
+
+    # Verify that replaying a batch changes nothing
+    response = await client.post("/likes/batch", json={"operations": operations[:1]})
+    assert response.json()["data"][0]["changed"] is False
+    response = await client.get(f"/articles/{test_article.slug}")
+    assert response.json()["data"]["likes_count"] == 1
+
+    # Verify that the last operation on a slug wins
+    operations = [
+        {"slug": test_article.slug, "action": "like"},
+        {"slug": test_article.slug, "action": "unlike"},
+    ]
+    response = await client.post("/likes/batch", json={"operations": operations})
+    assert [item["liked"] for item in response.json()["data"]] == [False, False]
+    response = await client.get(f"/articles/{test_article.slug}")
+    assert response.json()["data"]["likes_count"] == 0
+
+    # Verify that oversized batches are rejected
+    operations = [{"slug": f"slug-{i}", "action": "like"} for i in range(501)]
+    response = await client.post("/likes/batch", json={"operations": operations})
+    assert response.status_code == 422
+
+
+def test_like_request_bounds():
+    # Verify that oversized bodies are rejected before reaching the routes
+    requests = [
+        (LikeStatusesRequestSchema, {"slugs": ["slug"] * 101}),
+        (
+            LikeBatchRequestSchema,
+            {"operations": [{"slug": "slug", "action": "like"}] * 501},
+        ),
+    ]
+    for schema, body in requests:
+        with pytest.raises(ValidationError) as info:
+            schema.model_validate(body)
+        exc = RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in info.value.errors()]
+        )
+        response = validation_exception_handler(None, exc)
+        assert response.status_code == 422
+        assert orjson.loads(response.body)["data"].keys() == body.keys()
+
+
+def test_reserved_slugs():
+    # Verify that slugs shadowed by the search and trending routes are rejected
+    for slug in ["search", "trending"]:
+        with pytest.raises(ValueError):
+            Article(title="Reserved", slug=slug, desc="Reserved")
+
+
+async def test_reserved_slugs_constraint(database):
+    # Verify that the database also rejects reserved slugs written without the ORM
+    with pytest.raises(IntegrityError):
+        await database.execute(
+            insert(Article).values(title="Reserved", slug="search", desc="Reserved")
+        )
+
+
+async def test_search_articles(client, database):
+    database.add_all(
+        [
+            Article(title="Postgres tips", slug="postgres-tips", desc="Indexes"),
+            Article(title="Cooking", slug="cooking", desc="Postgres for chefs"),
+            Article(title="Gardening", slug="gardening", desc="Tomatoes"),
+        ]
+    )
+    await database.commit()
+
+    # Verify that title matches rank above description matches
+    response = await client.get("/articles/search", params={"q": "postgres"})
+    assert response.status_code == 200
+    assert [article["slug"] for article in response.json()["data"]] == [
+        "postgres-tips",
+        "cooking",
+    ]
+
+    # Verify that the results paginate by rank
+    response = await client.get(
+        "/articles/search", params={"q": "postgres", "limit": 1}
+    )
+    result = response.json()
+    assert [article["slug"] for article in result["data"]] == ["postgres-tips"]
+    response = await client.get(
+        "/articles/search",
+        params={"q": "postgres", "limit": 1, "cursor": result["next_cursor"]},
+    )
+    result = response.json()
+    assert [article["slug"] for article in result["data"]] == ["cooking"]
+    assert result["next_cursor"] is None
+
+    # Verify that an empty query is rejected
+    response = await client.get("/articles/search", params={"q": " "})
+    assert response.status_code == 400
+    assert response.json() == {
+        "status": "failure",
+        "message": "Search query is required",
     }
+
+
+async def test_trending_articles(client, database, test_article, test_user):
+    other = Article(title="Older", slug="older", desc="Liked days ago")
+    database.add(other)
+    await database.commit()
+    days_ago = datetime.now() - timedelta(days=3)
+    database.add_all(
+        [
+            Like(user_id=test_user.id, article_id=test_article.id),
+            Like(
+                user_id=test_user.id,
+                article_id=other.id,
+                created_at=days_ago,
+                updated_at=days_ago,
+            ),
+        ]
+    )
+    await database.commit()
+    assert await refresh_trending(database, hours=7 * 24)
+
+    # Verify that each window only counts likes made within it
+    response = await client.get("/articles/trending")
+    assert response.status_code == 200
+    data = response.json()["data"]
+    assert [(article["slug"], article["recent_likes"]) for article in data] == [
+        (test_article.slug, 1)
+    ]
+    response = await client.get("/articles/trending", params={"window": "7d"})
+    assert len(response.json()["data"]) == 2
+
+    response = await client.get("/articles/trending", params={"window": "1y"})
+    assert response.status_code == 400
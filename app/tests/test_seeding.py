@@ -0,0 +1,31 @@
+from sqlalchemy import delete, func, select
+
+from app.models import Article, Like, SeedProgress, User
+from app.seeding import article_rows, like_rows, seed_database
+
+
+def test_like_rows_are_unique_and_deterministic():
+    rows = list(like_rows(seed=7, start=0, stop=60, users=6, articles=10))
+    assert len({(user_id, article_id) for _, user_id, article_id, *_ in rows}) == 60
+    assert rows == list(like_rows(seed=7, start=0, stop=60, users=6, articles=10))
+    assert rows != list(like_rows(seed=8, start=0, stop=60, users=6, articles=10))
+
+    # Verify that likes only reference generated articles
+    article_ids = {row[0] for row in article_rows(seed=7, start=0, stop=10)}
+    assert {row[2] for row in rows} <= article_ids
+
+
+async def test_seed_database(engine, database):
+    async with engine.begin() as conn:
+        await conn.execute(delete(SeedProgress))
+
+    await seed_database(engine, users=5, articles=4, likes=12, batch_size=5)
+    # Verify that rerunning the same plan resumes instead of duplicating rows
+    await seed_database(engine, users=5, articles=4, likes=12, batch_size=5)
+
+    count = lambda model: select(func.count()).select_from(model)
+    assert (await database.execute(count(User))).scalar() == 5
+    assert (await database.execute(count(Article))).scalar() == 4
+    assert (await database.execute(count(Like))).scalar() == 12
+    likes_count = select(func.sum(Article.likes_count))
+    assert (await database.execute(likes_count)).scalar() == 12
@@ -0,0 +1,104 @@
+import asyncio
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app.models import BackgroundTask
+from app.tasks import MemoryTaskQueue, PostgresTaskQueue, task_handler
+
+calls = []
+
+
+@task_handler("test_flaky")
+async def flaky(key: str, failures: int) -> None:
+    calls.append(key)
+    if calls.count(key) <= failures:
+        raise RuntimeError("Temporary failure")
+
+
+async def test_memory_task_queue_retries_and_drains():
+    calls.clear()
+    queue = MemoryTaskQueue(concurrency=2, max_attempts=3, retry_backoff=0.01)
+
+    # Verify that tasks run inline until the queue is started
+    await queue.enqueue("test_flaky", key="inline", failures=0)
+    assert calls == ["inline"]
+
+    queue.start()
+    await queue.enqueue("test_flaky", key="retried", failures=2)
+    await queue.enqueue("test_flaky", key="dropped", failures=5)
+    await queue.enqueue("test_unknown")
+    assert len(queue) == 3
+
+    # Verify that shutdown waits for retries and gives up after max_attempts
+    await queue.stop(timeout=5)
+    assert calls.count("retried") == 3
+    assert calls.count("dropped") == 3
+    assert queue.completed == 2
+    assert len(queue) == 0
+
+
+async def test_postgres_task_queue(engine, database):
+    calls.clear()
+    queue = PostgresTaskQueue(
+        async_sessionmaker(bind=engine, expire_on_commit=False),
+        concurrency=2,
+        max_attempts=2,
+        retry_backoff=0,
+        poll_interval=0.01,
+        lease_timeout=60,
+    )
+    await queue.enqueue("test_flaky", key="leased", failures=0)
+    await queue.enqueue("test_flaky", key="dropped", failures=5)
+
+    # Verify that claimed rows are skipped by concurrent claims
+    assert len(await queue.claim(1)) == 1
+    [(task_id, name, payload, attempts)] = await queue.claim(5)
+    assert (payload["key"], attempts) == ("dropped", 1)
+    assert await queue.claim(5) == []
+
+    await queue.execute(task_id, name, payload, attempts)
+    queue.start()
+    for _ in range(100):
+        if calls.count("dropped") == 2:
+            break
+        await asyncio.sleep(0.01)
+    await queue.stop(timeout=5)
+
+    # Verify that the failing task was retried once and then given up on, while
+    # the first claim's lease keeps its task from running again
+    assert calls == ["dropped", "dropped"]
+    rows = (await database.execute(select(BackgroundTask))).scalars().all()
+    assert [(row.payload["key"], row.attempts) for row in rows] == [("leased", 1)]
+
+
+async def test_enqueue_in_transaction(engine, database):
+    calls.clear()
+    memory_queue = MemoryTaskQueue(concurrency=1, max_attempts=1, retry_backoff=0)
+    postgres_queue = PostgresTaskQueue(
+        async_sessionmaker(bind=engine, expire_on_commit=False),
+        concurrency=1,
+        max_attempts=1,
+        retry_backoff=0,
+        poll_interval=60,
+        lease_timeout=60,
+    )
+    memory_queue.start()
+
+    # Verify that tasks of a rolled back transaction are dropped
+    await memory_queue.enqueue("test_flaky", db=database, key="memory", failures=0)
+    await postgres_queue.enqueue("test_flaky", db=database, key="pg", failures=0)
+    await database.rollback()
+    await memory_queue.join()
+    assert calls == []
+    assert (await database.execute(select(BackgroundTask))).all() == []
+
+    # Verify that they are queued with the transaction's commit, not before
+    await memory_queue.enqueue("test_flaky", db=database, key="memory", failures=0)
+    await postgres_queue.enqueue("test_flaky", db=database, key="pg", failures=0)
+    assert len(memory_queue) == 0
+    await database.commit()
+    await memory_queue.stop(timeout=5)
+    assert calls == ["memory"]
+    rows = (await database.execute(select(BackgroundTask))).scalars().all()
+    assert [row.payload["key"] for row in rows] == ["pg"]
@@ -0,0 +1,21 @@
+import asyncio
+
+import pytest
+
+from app.handlers import RequestError
+from app.utils import get_password_hash, verify_password_async
+
+
+async def test_verify_password_async():
+    hashed_password = get_password_hash("testpassword")
+    assert await verify_password_async("testpassword", hashed_password)
+    assert not await verify_password_async("wrongpassword", hashed_password)
+
+
+async def test_password_hashing_backpressure(mocker):
+    # Verify that requests are shed once every hashing slot is taken
+    mocker.patch("app.utils.hashing_slots", asyncio.Semaphore(0))
+    with pytest.raises(RequestError) as exc_info:
+        await verify_password_async("testpassword", "hash")
+    assert exc_info.value.status_code == 503
+    assert exc_info.value.headers == {"Retry-After": "1"}
@@ -0,0 +1,93 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.cache import response_cache
+from app.conf import settings
+from app.database import SessionLocal
+from app.queries import clear_like_buckets_query, fill_like_buckets_query
+
+logger = logging.getLogger(__name__)
+
+TRENDING_WINDOWS = {"24h": timedelta(hours=24), "7d": timedelta(days=7)}
+TRENDING_CACHE_TAG = "trending"
+# Advisory lock held by the worker refreshing the buckets
+REFRESH_LOCK_KEY = 7101520
+
+
+def hour_start(moment: datetime) -> datetime:
+    return moment.replace(minute=0, second=0, microsecond=0)
+
+
+def window_start(window: str, now: Optional[datetime] = None) -> datetime:
+    # First bucket of the window; the current, partial hour counts as one bucket
+    now = now or datetime.now()
+    return hour_start(now) - TRENDING_WINDOWS[window] + timedelta(hours=1)
+
+
+async def refresh_trending(db: AsyncSession, hours: int) -> bool:
+    """
+    Recomputes the hourly like buckets of the last `hours` hours from the likes
+    table and drops buckets older than the longest window. Returns False when
+    another worker is already refreshing.
+    """
+    locked = await db.scalar(select(func.pg_try_advisory_xact_lock(REFRESH_LOCK_KEY)))
+    if not locked:
+        return False
+    now = datetime.now()
+    since = hour_start(now) - timedelta(hours=hours - 1)
+    expired_before = window_start("7d", now)
+    await db.execute(clear_like_buckets_query(since, expired_before))
+    await db.execute(fill_like_buckets_query(since))
+    await db.commit()
+    return True
+
+
+class TrendingRefresher:
+    """Keeps the like buckets current from a background task"""
+
+    def __init__(
+        self, session_factory: async_sessionmaker, interval: float, hours: int
+    ):
+        self.session_factory = session_factory
+        self.interval = interval
+        self.hours = hours
+        self._task: Optional[asyncio.Task] = None
+
+    async def refresh(self) -> bool:
+        try:
+            async with self.session_factory() as db:
+                refreshed = await refresh_trending(db, self.hours)
+        except Exception:
+            logger.exception("Failed to refresh trending articles")
+            return False
+        if refreshed:
+            await response_cache.invalidate_tag(TRENDING_CACHE_TAG)
+        return refreshed
+
+    async def _run(self) -> None:
+        while True:
+            await self.refresh()
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        if not self._task:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+trending_refresher = TrendingRefresher(
+    SessionLocal, settings.TRENDING_REFRESH_INTERVAL, settings.TRENDING_REFRESH_HOURS
+)
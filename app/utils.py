@@ -1,42 +1,249 @@
+import asyncio
+import base64
+import hashlib
+import json
+import math
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from datetime import UTC, datetime, timedelta
-from uuid import UUID
-from passlib.context import CryptContext
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+from uuid import UUID, uuid4
 import jwt
-from sqlalchemy import select
+from fastapi import Response
+from sqlalchemy import event, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.cache import TTLCache
 from app.conf import settings
+from app.handlers import RequestError
 from app.models import User
-
-pwd_context = CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+from app.revocation import TOKEN_LIFETIME, revocations
 
 ALGORITHM = "HS256"
 
 
+class AuthUser(NamedTuple):
+    # Lightweight principal returned for authenticated requests
+    id: UUID
+    name: str
+    email: str
+
+
+# Verified users keyed by id, so repeated requests skip the users lookup
+user_cache = TTLCache(maxsize=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.AUTH_CACHE_TTL)
+
+# Users who wrote recently, whose reads stay on the primary to see their own writes
+recent_writers = TTLCache(
+    maxsize=settings.AUTH_CACHE_MAX_SIZE, ttl=settings.READ_YOUR_WRITES_WINDOW
+)
+
+
 # PASSWORDS
+@lru_cache(maxsize=None)
+def pwd_context():
+    # passlib's crypto backends are slow to import and only needed on login,
+    # so they are loaded on first use rather than at startup
+    from passlib.context import CryptContext
+
+    return CryptContext(schemes=["pbkdf2_sha256"], deprecated="auto")
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return pwd_context().verify(plain_password, hashed_password)
 
 
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return pwd_context().hash(password)
+
+
+# pbkdf2 releases the GIL, so a small thread pool keeps it off the event loop
+hashing_executor = ThreadPoolExecutor(
+    max_workers=settings.PASSWORD_HASHING_WORKERS,
+    thread_name_prefix="password-hashing",
+)
+hashing_slots = asyncio.Semaphore(
+    settings.PASSWORD_HASHING_WORKERS + settings.PASSWORD_HASHING_QUEUE_SIZE
+)
+
+
+async def run_in_hashing_pool(func: Callable, *args: Any) -> Any:
+    # Shed load instead of queueing unboundedly when the pool is saturated
+    if hashing_slots.locked():
+        raise RequestError(
+            err_msg="Server is busy, please try again later",
+            status_code=503,
+            headers={"Retry-After": "1"},
+        )
+    async with hashing_slots:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(hashing_executor, func, *args)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    return await run_in_hashing_pool(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    return await run_in_hashing_pool(get_password_hash, password)
 
 
 # TOKENS
-def create_auth_token(user_id: UUID):
-    # generate auth token based and encode user's id
-    expire = datetime.now(UTC) + timedelta(hours=100)
-    to_encode = {"exp": expire, "user_id": str(user_id)}
+def create_auth_token(
+    user_id: UUID, name: Optional[str] = None, email: Optional[str] = None
+) -> str:
+    # generate auth token based and encode user's id. With the user's name and
+    # email, stateless auth can build the principal from the token alone
+    now = datetime.now(UTC)
+    to_encode = {
+        "exp": now + TOKEN_LIFETIME,
+        # Float, so revocations made within the same second are ordered correctly
+        "iat": now.timestamp(),
+        "jti": uuid4().hex,
+        "user_id": str(user_id),
+    }
+    if name is not None and email is not None:
+        to_encode.update(name=name, email=email)
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
 
-async def decodeAuth(db: AsyncSession, token: str):
+def decode_token(token: str) -> Optional[dict]:
+    # Verifies the token signature and expiry without touching the database
     try:
-        decoded = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
-        user = (
-            await db.execute(select(User).where(User.id == decoded["user_id"]))
-        ).scalar_one_or_none()
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        claims["user_id"] = UUID(claims["user_id"])
+        return claims
+    except:
+        return None
+
+
+def decode_token_user_id(token: str) -> Optional[UUID]:
+    claims = decode_token(token)
+    return claims["user_id"] if claims else None
+
+
+def unrevoked_token_user_id(token: str) -> Optional[UUID]:
+    # decode_token_user_id, also rejecting revoked tokens like decodeAuth does
+    claims = decode_token(token)
+    if not claims:
+        return None
+    user_id = claims["user_id"]
+    if revocations.is_revoked(claims.get("jti"), user_id, claims.get("iat", 0)):
+        return None
+    return user_id
+
+
+async def decodeAuth(db: AsyncSession, token: str) -> Optional[AuthUser]:
+    claims = decode_token(token)
+    if not claims:
+        return None
+    user_id = claims["user_id"]
+    if revocations.is_revoked(claims.get("jti"), user_id, claims.get("iat", 0)):
+        return None
+    if settings.AUTH_STATELESS and "name" in claims:
+        # Existence is vouched for by the signature and the revocation list
+        return AuthUser(user_id, claims["name"], claims["email"])
+
+    user = user_cache.get(user_id)
+    if user:
         return user
+    row = (
+        await db.execute(
+            select(User.id, User.name, User.email).where(User.id == user_id)
+        )
+    ).one_or_none()
+    if not row:
+        return None
+    user = AuthUser(*row)
+    user_cache.set(user_id, user)
+    return user
+
+
+def invalidate_user(user_id: UUID) -> None:
+    # Call after changing or deleting a user outside of the ORM (bulk statements, raw SQL)
+    user_cache.invalidate(user_id)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_user_on_change(mapper, connection, target: User) -> None:
+    invalidate_user(target.id)
+
+
+# READ-YOUR-WRITES
+# Signed cookie carrying a writer's stickiness to the primary, so it holds on
+# whichever worker serves their next read
+WRITE_MARKER_COOKIE = "last_write"
+
+
+def mark_recent_write(user_id: UUID, response: Optional[Response] = None) -> None:
+    recent_writers.set(user_id, True)
+    if response is None:
+        return
+    window = timedelta(seconds=settings.READ_YOUR_WRITES_WINDOW)
+    marker = jwt.encode(
+        {"user_id": str(user_id), "typ": "write", "exp": datetime.now(UTC) + window},
+        settings.SECRET_KEY,
+        algorithm=ALGORITHM,
+    )
+    response.set_cookie(
+        WRITE_MARKER_COOKIE,
+        marker,
+        max_age=math.ceil(settings.READ_YOUR_WRITES_WINDOW),
+        httponly=True,
+        samesite="lax",
+    )
+
+
+def has_recent_write(user_id: UUID, marker: Optional[str] = None) -> bool:
+    if recent_writers.get(user_id) is not None:
+        return True
+    claims = decode_token(marker) if marker else None
+    return bool(
+        claims and claims.get("typ") == "write" and claims["user_id"] == user_id
+    )
+
+
+# CURSORS
+def encode_cursor(created_at: datetime, id: UUID) -> str:
+    # Opaque token pointing at the last item of a page
+    payload = json.dumps([created_at.isoformat(), str(id)]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Optional[Tuple[datetime, UUID]]:
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        created_at, id = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        return datetime.fromisoformat(created_at), UUID(id)
+    except:
+        return None
+
+
+def encode_search_cursor(rank: float, id: UUID) -> str:
+    # JSON keeps the float's exact value, which the next page seeks past
+    payload = json.dumps([rank, str(id)]).encode()
+    return base64.urlsafe_b64encode(payload).decode().rstrip("=")
+
+
+def decode_search_cursor(cursor: str) -> Optional[Tuple[float, UUID]]:
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        rank, id = json.loads(base64.urlsafe_b64decode(cursor + padding))
+        return float(rank), UUID(id)
     except:
         return None
+
+
+# ETAGS
+def make_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(etag: str, if_none_match: Optional[str]) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+    return etag in candidates
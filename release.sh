@@ -3,5 +3,8 @@
 # Run migrations
 alembic upgrade heads
 
+# Create demo data if missing
+python -m app.commands initial_data
+
 # Start application
 uvicorn app.main:app --host 0.0.0.0 --port 8000 --reload 
\ No newline at end of file